@@ -1,7 +1,9 @@
+import argparse
+import os
+from multiprocessing import Pool
+
 import numpy as np
 from matplotlib import pyplot as plt
-import itertools
-from scipy.spatial import distance
 
 
 tests_number = 10
@@ -12,7 +14,10 @@ end_dim = 101
 dims = np.arange(start_dim, end_dim)
 dims_num = end_dim - start_dim
 
-# np.random.seed(1234)
+seed = 1234
+max_chunk_size = 2 ** 24    # max number of coordinates generated at once
+block_size = 2048           # pairwise distances are computed in block_size x block_size tiles
+cache_dir = 'cache'
 
 ############### utils ###############
 
@@ -29,30 +34,31 @@ def plot_with_error_bars(title, x, y, yerr, xlabel, ylabel, show=False, save_dir
         plt.savefig(save_dir)
     plt.clf()
 
-############### zad. 1 ###############
+def random_points(rng, dim, tests=tests_number, points=points_number, group=1):
+    # yields all the tests at once: arrays of shape (tests, chunk, dim) of points from [-1, 1]^dim,
+    # chunk is a multiple of group and tests * chunk * dim <= max_chunk_size (unless a single group is bigger)
+    chunk = max(max_chunk_size // (tests * dim * group), 1) * group
+    for start in range(0, points, chunk):
+        yield rng.uniform(low=-1, high=1, size=(tests, min(chunk, points - start), dim))
 
-def inside_outside_ratios(dim):
-    # generate random points
-    points = np.random.uniform(low=-1, high=1, size=(points_number, dim))
-    # find the radii - dist between points and (0, ..., 0)
-    radii = np.sqrt(np.sum(np.square(points), axis=1))
+############### zad. 1 ###############
 
-    # find the ratios
-    inside_points = points[radii <= 1]
-    inside_ratio = len(inside_points) / points_number
-    outside_ratio = 1 - inside_ratio
+def inside_outside_ratios(rng, dim, tests=tests_number, points=points_number):
+    # columns: 0: inside, 1 - outside, one row per test
+    inside_points = np.zeros(tests)
+    for chunk in random_points(rng, dim, tests, points):
+        # point is inside if its squared dist to (0, ..., 0) is <= 1
+        inside_points += np.count_nonzero(np.einsum('tpd,tpd->tp', chunk, chunk) <= 1, axis=1)
 
-    return np.array([inside_ratio, outside_ratio])
+    inside_ratios = inside_points / points
+    return np.stack([inside_ratios, 1 - inside_ratios], axis=1)
 
 def zad1():
     avgs = np.empty(shape=(dims_num, 2))   # columns: 0: inside, 1 - outside
     stds = np.empty(shape=(dims_num, 2))
 
     for i, dim in enumerate(dims):
-        ratios = np.empty(shape=(tests_number, 2))
-        for j in range(tests_number):
-            ratios[j] = inside_outside_ratios(dim)
-
+        ratios = load_result(1, dim)
         avgs[i] = np.average(ratios, axis=0)
         stds[i] = np.std(ratios, axis=0)
 
@@ -66,26 +72,50 @@ def zad1():
 
 ############### zad. 2 ###############
 
+def merge_stats(stats, tile_stats):
+    # Chan's parallel version of Welford's algorithm: (count, mean, M2) of the union of two sets of values
+    count, mean, m2 = stats
+    tile_count, tile_mean, tile_m2 = tile_stats
+    total = count + tile_count
+    delta = tile_mean - mean
+    return total, mean + delta * tile_count / total, m2 + tile_m2 + delta ** 2 * count * tile_count / total
+
+def pairwise_distance_stats(points, block_size=block_size):
+    # mean and std of the distances between all pairs of points, computed tile by tile without the n x n matrix
+    squared_norms = np.einsum('pd,pd->p', points, points)
+    stats = (0, 0., 0.)
+    for i in range(0, len(points), block_size):
+        for j in range(i, len(points), block_size):
+            # |a - b|^2 = |a|^2 + |b|^2 - 2 a.b
+            squared = squared_norms[i:i + block_size, np.newaxis] + squared_norms[np.newaxis, j:j + block_size]
+            squared -= 2 * points[i:i + block_size] @ points[j:j + block_size].T
+            if i == j:  # only the pairs above the diagonal
+                squared = squared[np.triu_indices(len(squared), k=1)]
+            dists = np.sqrt(np.maximum(squared, 0)).ravel()
+            if len(dists) > 0:
+                tile_mean = np.average(dists)
+                stats = merge_stats(stats, (len(dists), tile_mean, np.sum(np.square(dists - tile_mean))))
+
+    count, mean, m2 = stats
+    return mean, np.sqrt(m2 / count)
+
+def distance_stats(rng, dim, tests=tests_number, points=points_number):
+    # columns: 0: average distance, 1: std of the distances, one row per test
+    stats = np.empty(shape=(tests, 2))
+    for j in range(tests):
+        stats[j] = pairwise_distance_stats(rng.uniform(low=-1, high=1, size=(points, dim)))
+    return stats
+
 def zad2():
     avg_dists = np.empty(shape=(dims_num, 2))   # columns: 0: value, 1: std
     avg_stds = np.empty(shape=(dims_num, 2))
     avg_ratios = np.empty(shape=(dims_num, 2))
 
     for i, dim in enumerate(dims):
-        dim_dists = np.empty(shape=(tests_number))
-        dim_stds = np.empty(shape=(tests_number))
-        dim_ratios = np.empty(shape=(tests_number))
-        for j in range(tests_number):
-            points = np.random.uniform(
-                low=-1, high=1, size=(points_number, dim))
-            combinations = itertools.combinations(points, 2)
-            dists = np.empty(shape=(points_number * (points_number - 1) // 2))
-            for k, (A, B) in enumerate(combinations):
-                dists[k] = distance.euclidean(A, B)
-
-            dim_dists[j] = np.average(dists)
-            dim_stds[j] = np.std(dists)
-            dim_ratios[j] = dim_stds[j] / dim_dists[j]
+        stats = load_result(2, dim)
+        dim_dists = stats[:, 0]
+        dim_stds = stats[:, 1]
+        dim_ratios = dim_stds / dim_dists
 
         avg_dists[i][0] = np.average(dim_dists)
         avg_dists[i][1] = np.std(dim_dists)
@@ -108,22 +138,24 @@ def zad2():
 
 ############### zad. 3 ###############
 
-def find_angle(v1, v2):
-    v1 /= np.linalg.norm(v1)
-    v2 /= np.linalg.norm(v2)
-    dot_product = np.dot(v1, v2)
-    return np.arccos(dot_product)
+def find_angles(v1, v2):
+    # angles between corresponding vectors along the last axis
+    dot_products = np.einsum('...d,...d->...', v1, v2)
+    norms = np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1)
+    return np.arccos(np.clip(dot_products / norms, -1, 1))
+
+def random_angles(rng, dim, tests=tests_number, points=points_number):
+    # every angle is found between vectors AB and CD made of 4 different random points
+    # the points are i.i.d., so consecutive quadruples are as random as quadruples of random indices
+    angles = []
+    for chunk in random_points(rng, dim, tests, points // 4 * 4, group=4):
+        quadruples = chunk.reshape(tests, -1, 4, dim)
+        angles.append(find_angles(quadruples[:, :, 1] - quadruples[:, :, 0], quadruples[:, :, 3] - quadruples[:, :, 2]))
+    return np.concatenate(angles, axis=1).ravel()
 
 def zad3():
     for dim in dims:
-        dim_angles = np.empty(shape=(tests_number * (points_number // 4)))
-        angle_idx = 0
-        for _ in range(tests_number):
-            points = np.random.uniform(low=-1, high=1, size=(points_number, dim))
-            for _ in range(points_number // 4):
-                idx = np.random.choice(points.shape[0], size=4, replace=False)
-                dim_angles[angle_idx] = find_angle(points[idx[1]] - points[idx[0]], points[idx[3]] - points[idx[2]])
-                angle_idx += 1
+        dim_angles = load_result(3, dim)
 
         # histogram
         plt.hist(dim_angles, bins=50, range=(0, np.pi))
@@ -136,9 +168,51 @@ $\mu={round(np.average(dim_angles), 2)}$, $\sigma={round(np.std(dim_angles), 2)}
         plt.savefig(f'plots/zad3/dim {dim}')
         plt.clf()
 
+############### driver ###############
+
+# task number -> (function computing the results for a single dimension, function plotting all the results)
+tasks = {1: (inside_outside_ratios, zad1), 2: (distance_stats, zad2), 3: (random_angles, zad3)}
+
+def result_path(task, dim, points=points_number, tests=tests_number, seed=seed):
+    return os.path.join(cache_dir, f'zad{task}', f'dim={dim}, points={points}, tests={tests}, seed={seed}.npy')
+
+def load_result(task, dim):
+    return np.load(result_path(task, dim))
+
+def compute_result(shard):
+    task, dim, points, tests, seed = shard
+    # every shard has its own generator, so the results do not depend on the order of computation
+    rng = np.random.default_rng([seed, task, dim])
+    result = tasks[task][0](rng, dim, tests, points)
+
+    path = result_path(task, dim, points, tests, seed)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as file:
+        np.save(file, result)
+    os.replace(path + '.tmp', path)
+    return shard
+
+def compute_results(task_numbers, processes=None):
+    # computes the results that are not cached yet, one (task, dim) shard per process
+    shards = [(task, int(dim), points_number, tests_number, seed) for task in task_numbers for dim in dims]
+    shards = [shard for shard in shards if not os.path.exists(result_path(*shard[:2]))]
+    if len(shards) == 0:
+        return
+
+    with Pool(processes) as pool:
+        for i, (task, dim, *_) in enumerate(pool.imap_unordered(compute_result, shards), 1):
+            print(f'{i}/{len(shards)}: zad. {task}, dim={dim}')
+
 ######################################
 
 if __name__ == "__main__":
-    # zad1()
-    zad2()
-    # zad3()
+    parser = argparse.ArgumentParser(description='Computes the missing results in parallel, then plots the cached ones.')
+    parser.add_argument('tasks', nargs='*', type=int, default=list(tasks), help='task numbers, all by default')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    if any(task not in tasks for task in args.tasks):
+        parser.error(f'tasks must be from {list(tasks)}')
+
+    compute_results(args.tasks, args.processes)
+    for task in args.tasks:
+        tasks[task][1]()
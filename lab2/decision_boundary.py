@@ -0,0 +1,86 @@
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+
+def grid_axes(X, h, margin=.05):
+    """
+        Coordinates of the grid columns and rows covering the 2D points X with the given margin, step h.
+    """
+    x_min, x_max = X[:, 0].min() - margin, X[:, 0].max() + margin
+    y_min, y_max = X[:, 1].min() - margin, X[:, 1].max() + margin
+    return np.arange(x_min, x_max, h), np.arange(y_min, y_max, h)
+
+
+def near_label_change(labels):
+    """
+        Mask of the grid points which have a neighbor (also diagonal) with a different label, or are next to one.
+    """
+    change = np.zeros(labels.shape, dtype=bool)
+    for axis in (0, 1):
+        start = [slice(None), slice(None)]
+        end = [slice(None), slice(None)]
+        start[axis], end[axis] = slice(1, None), slice(None, -1)
+        differs = labels[tuple(start)] != labels[tuple(end)]
+        change[tuple(start)] |= differs
+        change[tuple(end)] |= differs
+
+    # grow the mask by one point in every direction
+    padded = np.pad(change, 1)
+    near = np.zeros(labels.shape, dtype=bool)
+    for dy in range(3):
+        for dx in range(3):
+            near |= padded[dy:dy + labels.shape[0], dx:dx + labels.shape[1]]
+    return near
+
+
+def predict_grid(model, xs, ys, refine_factor=1, tile_size=2 ** 16, n_jobs=None):
+    """
+        Labels predicted by the fitted model on the grid xs x ys, shape (len(ys), len(xs)) like in np.meshgrid.
+
+        The grid is predicted in tiles of whole rows with at most tile_size points (unless a single row is longer), on
+        a pool of n_jobs threads, so the memory used by the points does not depend on the size of the grid.
+
+        With refine_factor > 1 the model is first evaluated on every refine_factor-th column and row. Every grid point
+        gets the label of its nearest coarse point, and only the points near a label change on the coarse grid are
+        predicted again. Regions narrower than refine_factor points may be missed.
+    """
+    if refine_factor > 1:
+        coarse = predict_grid(model, xs[::refine_factor], ys[::refine_factor], tile_size=tile_size, n_jobs=n_jobs)
+        nearest_rows = np.minimum(np.rint(np.arange(len(ys)) / refine_factor).astype(int), coarse.shape[0] - 1)
+        nearest_cols = np.minimum(np.rint(np.arange(len(xs)) / refine_factor).astype(int), coarse.shape[1] - 1)
+        labels = coarse[np.ix_(nearest_rows, nearest_cols)]
+        refine = near_label_change(coarse)[np.ix_(nearest_rows, nearest_cols)]
+    else:
+        labels = None
+        refine = None
+
+    rows_per_tile = max(tile_size // len(xs), 1)
+
+    def predict_tile(start):
+        end = min(start + rows_per_tile, len(ys))
+        if refine is None:
+            rows, cols = np.divmod(np.arange((end - start) * len(xs)), len(xs))
+        else:
+            rows, cols = np.nonzero(refine[start:end])
+        if len(rows) == 0:
+            return start, rows, cols, None
+        return start, rows, cols, model.predict(np.column_stack([xs[cols], ys[start + rows]]))
+
+    with ThreadPool(n_jobs) as pool:
+        for start, rows, cols, predicted in pool.imap_unordered(predict_tile, range(0, len(ys), rows_per_tile)):
+            if predicted is None:
+                continue
+            if labels is None:
+                labels = np.empty((len(ys), len(xs)), dtype=predicted.dtype)
+            labels[start + rows, cols] = predicted
+    return labels
+
+
+def decision_boundary(model, X, h, margin=.05, **kwargs):
+    """
+        Grid columns, rows and predicted labels for plotting the decision regions of the fitted model around the 2D
+        points X with contourf(xs, ys, labels). kwargs are passed to predict_grid.
+    """
+    xs, ys = grid_axes(X, h, margin)
+    return xs, ys, predict_grid(model, xs, ys, **kwargs)
@@ -0,0 +1,72 @@
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier, NearestNeighbors
+from sklearn.pipeline import Pipeline
+
+from preprocessing import MahalanobisWhitener
+
+
+def uses_whitening(metric, metric_params):
+    # Mahalanobis metric without an explicit covariance: the covariance of the training data, by whitening
+    return metric == 'mahalanobis' and not metric_params
+
+
+def make_neighbors_model(n_neighbors, weights='uniform', metric='minkowski', metric_params=None):
+    """
+        KNeighborsClassifier, with metric='mahalanobis' and no metric_params replaced by a pipeline which whitens the
+        training data once and searches for the neighbors with the Euclidean metric.
+    """
+    if uses_whitening(metric, metric_params):
+        return Pipeline([
+            ('whitener', MahalanobisWhitener()),
+            ('neighbors', KNeighborsClassifier(n_neighbors=n_neighbors, weights=weights, metric='euclidean'))
+        ])
+    return KNeighborsClassifier(n_neighbors=n_neighbors, weights=weights, metric=metric, metric_params=metric_params)
+
+
+def neighbor_weights(dists, weights):
+    """
+        Same weights as KNeighborsClassifier: 1 for 'uniform', 1 / dist for 'distance'. If a point has neighbors at
+        distance 0, only these neighbors vote. The distances are sorted, so this does not depend on k.
+    """
+    if weights == 'uniform':
+        return np.ones_like(dists)
+    with np.errstate(divide='ignore'):
+        inverse = 1 / dists
+    zero_rows = dists[:, 0] == 0
+    inverse[zero_rows] = dists[zero_rows] == 0
+    return inverse
+
+
+def k_sweep_predictions(X_train, y_train, X_test, k_range, weights='uniform', metric='minkowski', metric_params=None):
+    """
+        Predictions of KNeighborsClassifier(n_neighbors=k) for every k in k_range, shape (len(k_range), len(X_test)).
+        The neighbors are queried once with the largest k, the votes for smaller k are prefix sums of the same votes.
+        The metrics are the same as in make_neighbors_model.
+    """
+    k_range = np.asarray(k_range)
+    if uses_whitening(metric, metric_params):
+        whitener = MahalanobisWhitener().fit(X_train)
+        X_train, X_test = whitener.transform(X_train), whitener.transform(X_test)
+        metric, metric_params = 'euclidean', None
+    classes, y_encoded = np.unique(y_train, return_inverse=True)
+
+    neighbors = NearestNeighbors(n_neighbors=k_range.max(), metric=metric, metric_params=metric_params)
+    neighbors.fit(X_train)
+    dists, indices = neighbors.kneighbors(X_test)
+
+    votes = np.zeros(indices.shape + (len(classes),))
+    np.put_along_axis(votes, y_encoded[indices][:, :, np.newaxis], neighbor_weights(dists, weights)[:, :, np.newaxis],
+                      axis=2)
+    votes = np.cumsum(votes, axis=1)[:, k_range - 1]
+
+    # ties go to the first class, like in KNeighborsClassifier
+    return classes[np.argmax(votes, axis=2)].T
+
+
+def k_sweep_accuracies(X_train, y_train, X_test, y_test, k_range, weights='uniform', metric='minkowski',
+                       metric_params=None):
+    """
+        Accuracy of KNeighborsClassifier(n_neighbors=k) for every k in k_range.
+    """
+    predictions = k_sweep_predictions(X_train, y_train, X_test, k_range, weights, metric, metric_params)
+    return np.mean(predictions == y_test, axis=1)
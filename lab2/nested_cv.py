@@ -0,0 +1,140 @@
+import os
+import queue
+import tempfile
+from multiprocessing import Pool
+
+import numpy as np
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedShuffleSplit
+from threadpoolctl import threadpool_limits
+
+from k_sweep import k_sweep_accuracies, make_neighbors_model
+
+# data of a worker process, set by init_worker
+worker_data = {}
+
+
+def make_splits(n_test, n_validation):
+    test_split = StratifiedShuffleSplit(n_splits=n_test, test_size=0.2, random_state=42)
+    validate_split = StratifiedShuffleSplit(n_splits=n_validation, test_size=0.2, random_state=43)
+    return test_split, validate_split
+
+
+def init_worker(data_dir, n_test, n_validation):
+    # the dataset is memory-mapped, not pickled with every task; the splits are deterministic, so every worker
+    # computes them again instead of receiving the indices
+    X = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(data_dir, 'y.npy'), mmap_mode='r')
+    test_split, validate_split = make_splits(n_test, n_validation)
+    outer_splits = list(test_split.split(X, y))
+    worker_data.update(X=X, y=y, outer_splits=outer_splits, inner_splits={}, validate_split=validate_split)
+    # the tasks run in parallel already
+    threadpool_limits(1)
+
+
+def outer_train_test(i):
+    train_index, test_index = worker_data['outer_splits'][i]
+    X, y = worker_data['X'], worker_data['y']
+    return X[train_index], y[train_index], X[test_index], y[test_index]
+
+
+def validate_task(task):
+    """
+        Accuracies for every k on inner split j of the training data of outer split i.
+    """
+    config_index, i, j, k_range, (weights, metric, metric_params) = task
+    X_train, y_train, _, _ = outer_train_test(i)
+    if i not in worker_data['inner_splits']:
+        worker_data['inner_splits'][i] = list(worker_data['validate_split'].split(X_train, y_train))
+    train_index, test_index = worker_data['inner_splits'][i][j]
+
+    accuracies = k_sweep_accuracies(X_train[train_index], y_train[train_index], X_train[test_index],
+                                    y_train[test_index], k_range, weights, metric, metric_params)
+    return 'validate', config_index, i, j, accuracies
+
+
+def test_task(task):
+    """
+        Accuracy of the model with the best k, trained on the training data of outer split i.
+    """
+    config_index, i, k_best, (weights, metric, metric_params) = task
+    X_train, y_train, X_test, y_test = outer_train_test(i)
+    neighbors_model = make_neighbors_model(n_neighbors=k_best, weights=weights, metric=metric,
+                                           metric_params=metric_params)
+    neighbors_model.fit(X_train, y_train)
+    return 'test', config_index, i, None, accuracy_score(neighbors_model.predict(X_test), y_test)
+
+
+def nested_cross_validation(X, y, configs, n_test, n_validation, k_range, processes=None):
+    """
+        Nested cross-validation of KNN models for every (weights, metric, metric_params) in configs: k is chosen from
+        k_range on n_validation inner splits of the training data of every one of n_test outer splits, and the model
+        with the best k is scored on the outer test data.
+
+        Every (config, outer split, inner split) and every final (config, outer split) test is a separate task on a
+        pool of processes. The results are printed in the same order as by a serial loop, as soon as they are ready.
+        Returns the means and stds of the test scores of the configs.
+    """
+    k_range = np.asarray(k_range)
+    n_configs = len(configs)
+    validation_scores = np.empty((n_configs, n_test, len(k_range), n_validation))   # k in rows, inner splits in columns
+    n_validated = np.zeros((n_configs, n_test), dtype=int)
+    best = {}   # (config, outer split) -> (k_best, mean, std)
+    test_scores = np.full((n_configs, n_test), np.nan)
+
+    # printing position: the next config and outer split, whether the config header was printed
+    printed = {'config': 0, 'iter': 0, 'header': False}
+
+    def print_ready():
+        while printed['config'] < n_configs:
+            c, i = printed['config'], printed['iter']
+            if not printed['header']:
+                weights, metric, _ = configs[c]
+                print(f'weights: {weights}, metric: {metric}')
+                printed['header'] = True
+            if i < n_test:
+                if np.isnan(test_scores[c, i]):
+                    return
+                k_best, mean, std = best[c, i]
+                print(f'iter: {i:2}, SCORE: {test_scores[c, i]:.6f}, best k: {k_best:2} -- '
+                      f'mean: {mean:.6f} +- {std:.6f}')
+                printed['iter'] += 1
+            else:
+                print(f'mean: {test_scores[c].mean():.6f} +- {test_scores[c].std():.6f}')
+                print('=========================================')
+                printed.update(config=c + 1, iter=0, header=False)
+
+    results = queue.Queue()
+    with tempfile.TemporaryDirectory() as data_dir:
+        np.save(os.path.join(data_dir, 'X.npy'), X)
+        np.save(os.path.join(data_dir, 'y.npy'), y)
+
+        with Pool(processes, initializer=init_worker, initargs=(data_dir, n_test, n_validation)) as pool:
+            def submit(function, task):
+                pool.apply_async(function, (task,), callback=results.put, error_callback=results.put)
+
+            # in the printing order, so that the first results are ready first
+            for c, config in enumerate(configs):
+                for i in range(n_test):
+                    for j in range(n_validation):
+                        submit(validate_task, (c, i, j, k_range, config))
+
+            for _ in range(n_configs * n_test * (n_validation + 1)):
+                result = results.get()
+                if isinstance(result, Exception):
+                    raise result
+                kind, c, i, j, value = result
+
+                if kind == 'validate':
+                    validation_scores[c, i, :, j] = value
+                    n_validated[c, i] += 1
+                    if n_validated[c, i] == n_validation:
+                        mean, std = validation_scores[c, i].mean(axis=1), validation_scores[c, i].std(axis=1)
+                        idx_best = mean.argmax()
+                        best[c, i] = int(k_range[idx_best]), mean[idx_best], std[idx_best]
+                        submit(test_task, (c, i, best[c, i][0], configs[c]))
+                else:
+                    test_scores[c, i] = value
+                    print_ready()
+
+    return test_scores.mean(axis=1), test_scores.std(axis=1)
@@ -0,0 +1,63 @@
+import numpy as np
+from scipy.linalg import solve_triangular
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
+
+
+class IrregularTransformer(BaseEstimator, TransformerMixin):
+    """
+        Scales the 2D points by (x_mult, y_mult) and rotates them by rotation radians around (0, 0), as a single
+        multiplication by a 2x2 matrix. float32 data stays float32, other data is transformed to float64.
+
+        The transformer does not depend on the data, so fit and partial_fit only build the matrix. transform works on
+        chunks of chunk_size rows, so X and out may be memory-mapped arrays larger than the memory.
+    """
+
+    def __init__(self, x_mult=1., y_mult=1., rotation=0., chunk_size=2 ** 16):
+        self.x_mult = x_mult
+        self.y_mult = y_mult
+        self.rotation = rotation
+        self.chunk_size = chunk_size
+
+    def fit(self, X, y=None):
+        cos, sin = np.cos(self.rotation), np.sin(self.rotation)
+        # row vectors: x -> x S^T R^T
+        self.matrix_ = (np.array([[cos, -sin], [sin, cos]]) @ np.diag([self.x_mult, self.y_mult])).T
+        return self
+
+    def partial_fit(self, X, y=None):
+        return self.fit(X, y)
+
+    def transform(self, X, out=None):
+        """
+            out - optional array of the shape of X for the result, may be X itself.
+        """
+        check_is_fitted(self)
+        X = np.asarray(X)
+        if out is None:
+            out = np.empty(X.shape, dtype=X.dtype if X.dtype == np.float32 else float)
+        matrix = self.matrix_.astype(out.dtype)
+        for start in range(0, len(X), self.chunk_size):
+            end = start + self.chunk_size
+            # matmul copies the chunk first if it overlaps out
+            np.matmul(X[start:end], matrix, out=out[start:end])
+        return out
+
+
+class MahalanobisWhitener(BaseEstimator, TransformerMixin):
+    """
+        Whitens the data with the Cholesky factor of the covariance of the training data, cov = L L^T:
+        x -> L^-1 (x - mean). The Euclidean distances between transformed points are the Mahalanobis distances
+        between the original points, so a KD-tree / ball tree with the Euclidean metric finds the Mahalanobis
+        neighbors.
+    """
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype=float)
+        self.mean_ = X.mean(axis=0)
+        self.cholesky_ = np.linalg.cholesky(np.cov(X, rowvar=False))
+        return self
+
+    def transform(self, X):
+        check_is_fitted(self)
+        return solve_triangular(self.cholesky_, (np.asarray(X, dtype=float) - self.mean_).T, lower=True).T
@@ -0,0 +1,177 @@
+import os
+
+import numpy as np
+from scipy import linalg
+from sklearn.decomposition import PCA
+from sklearn.utils import gen_batches
+from sklearn.utils.extmath import svd_flip
+
+
+class EigenFaces:
+    """
+        PCA of flattened images, fitted once. The projections and reconstructions for any number of components k are
+        computed by slicing the cached components and scores, instead of fitting PCA(n_components=k) again.
+
+        n_components - number of components to fit, all by default. When only the top ones are needed, they are found
+        with a randomized SVD unless svd_solver says otherwise.
+        batch_size - if set, fit streams the images in batches (e.g. from a memory-mapped matrix) through partial_fit,
+        so only a batch and the n_components components are in memory at once. The result is the same as of the full
+        PCA up to the truncation to n_components after every batch. The batched fit and partial_fit need n_components,
+        without the truncation the components would grow with the number of images.
+    """
+
+    # fitted attributes saved by save
+    model_attributes = ['mean_', 'var_', 'components_', 'singular_values_', 'explained_variance_',
+                        'explained_variance_ratio_', 'n_samples_']
+
+    def __init__(self, n_components=None, svd_solver=None, random_state=None, batch_size=None):
+        self.n_components = n_components
+        self.svd_solver = svd_solver
+        self.random_state = random_state
+        self.batch_size = batch_size
+
+    def fit(self, data):
+        if self.batch_size is not None:
+            return self.fit_batches(data)
+
+        svd_solver = self.svd_solver
+        if svd_solver is None:
+            svd_solver = 'full' if self.n_components is None else 'randomized'
+        pca = PCA(n_components=self.n_components, svd_solver=svd_solver, random_state=self.random_state)
+        self.scores_ = pca.fit_transform(data)
+
+        self.mean_ = pca.mean_
+        self.var_ = np.var(data, axis=0, dtype=float)
+        self.components_ = pca.components_
+        self.singular_values_ = pca.singular_values_
+        self.explained_variance_ = pca.explained_variance_
+        self.explained_variance_ratio_ = pca.explained_variance_ratio_
+        self.n_samples_ = len(data)
+        return self
+
+    def fit_batches(self, data):
+        # the model is updated batch by batch, then the scores of all the images are computed with the final one
+        self.check_n_components()
+        batches = list(gen_batches(len(data), self.batch_size, min_batch_size=self.n_components))
+        self.n_samples_ = 0
+        for batch in batches:
+            self.update(data[batch])
+        self.scores_ = np.concatenate([self.transform(data[batch]) for batch in batches])
+        return self
+
+    def partial_fit(self, images):
+        """
+            Adds new images to the fit without fitting again on the previous ones. Their scores are appended to the
+            cached scores, the scores of the previous images are moved to the new mean and components (exact if no
+            components were dropped, otherwise the scores of their reconstructions). Needs n_components.
+        """
+        if getattr(self, 'n_samples_', 0) == 0:
+            self.n_samples_ = 0
+            self.update(images)
+            self.scores_ = self.transform(images)
+            return self
+
+        mean, components = self.mean_, self.components_
+        self.update(images)
+        if self.scores_ is not None:
+            previous_scores = (mean - self.mean_) @ self.components_.T
+            previous_scores = previous_scores + self.scores_ @ (components @ self.components_.T)
+            self.scores_ = np.concatenate([previous_scores, self.transform(images)])
+        return self
+
+    def check_n_components(self):
+        if self.n_components is None:
+            raise ValueError('n_components is required to fit in batches, otherwise the components grow with the '
+                             'number of images')
+
+    def update(self, images):
+        """
+            Incremental PCA update (as in sklearn.decomposition.IncrementalPCA): the SVD of the previous components
+            scaled by their singular values, the new centered images and a correction for the shift of the mean.
+        """
+        self.check_n_components()
+        images = np.asarray(images, dtype=float)
+        n_previous, n_images = self.n_samples_, len(images)
+        n_total = n_previous + n_images
+        images_mean = images.mean(axis=0)
+        images_var = images.var(axis=0)
+
+        rows = [images - images_mean]
+        if n_previous > 0:
+            delta = images_mean - self.mean_
+            rows = [self.singular_values_[:, np.newaxis] * self.components_] + rows
+            rows.append(-np.sqrt(n_previous * n_images / n_total) * delta[np.newaxis])
+            self.mean_ = self.mean_ + delta * n_images / n_total
+            self.var_ = (n_previous * self.var_ + n_images * images_var
+                         + np.square(delta) * n_previous * n_images / n_total) / n_total
+        else:
+            self.mean_, self.var_ = images_mean, images_var
+
+        U, S, Vt = linalg.svd(np.concatenate(rows), full_matrices=False, check_finite=False)
+        U, Vt = svd_flip(U, Vt, u_based_decision=False)
+        self.n_samples_ = n_total
+        self.components_ = Vt[:self.n_components]
+        self.singular_values_ = S[:self.n_components]
+        self.explained_variance_ = np.square(self.singular_values_) / (n_total - 1)
+        self.explained_variance_ratio_ = np.square(self.singular_values_) / (np.sum(self.var_) * n_total)
+
+    def save(self, path):
+        """
+            Saves the fitted model (without the scores of the fitted images) to an .npz file, atomically.
+        """
+        with open(path + '.tmp', 'wb') as file:
+            np.savez(file, **{name: getattr(self, name) for name in self.model_attributes})
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        """
+            Model saved by save. The scores of the images it was fitted on are not saved, partial_fit only updates it.
+        """
+        with np.load(path) as model:
+            eigenfaces = cls(n_components=len(model['components_']))
+            for name in cls.model_attributes:
+                setattr(eigenfaces, name, model[name])
+        eigenfaces.n_samples_ = int(eigenfaces.n_samples_)
+        eigenfaces.scores_ = None
+        return eigenfaces
+
+    def scores(self, k=None):
+        """
+            Projections of the fitted images on the first k components.
+        """
+        return self.scores_[:, :k]
+
+    def transform(self, data, k=None):
+        """
+            Projections of new images on the first k components.
+        """
+        return (np.asarray(data, dtype=float) - self.mean_) @ self.components_[:k].T
+
+    def inverse_transform(self, scores):
+        """
+            Images reconstructed from their projections on the first scores.shape[1] components.
+        """
+        return scores @ self.components_[:scores.shape[1]] + self.mean_
+
+    def reconstruct(self, k):
+        """
+            Fitted images reconstructed from their first k components.
+        """
+        return self.inverse_transform(self.scores(k))
+
+    def reconstructions(self, ks):
+        """
+            Dict k -> reconstruct(k) for every k in ks.
+        """
+        return {k: self.reconstruct(k) for k in ks}
+
+    def reconstruction_errors(self):
+        """
+            Squared reconstruction error of the fitted images (summed over the pixels, averaged over the images) for
+            every k from 0 to the number of components. The components are orthonormal, so the error of k components is
+            the squared norm of the centered images minus the squares of their first k scores - all the errors come from
+            a single cumsum.
+        """
+        explained = np.cumsum(np.sum(np.square(self.scores_), axis=0)) / self.n_samples_
+        return np.maximum(np.sum(self.var_) - np.concatenate([[0], explained]), 0)
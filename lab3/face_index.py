@@ -0,0 +1,85 @@
+import argparse
+import os
+import time
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import gen_batches
+
+from eigenfaces import EigenFaces
+from ingest import load_dataset
+
+
+class FaceIndex:
+    """
+        Nearest faces in the space of the first n_components eigenfaces of a fitted EigenFaces. Images are projected
+        in batches with a single matmul each, the projected dataset is indexed with NearestNeighbors.
+    """
+
+    def __init__(self, eigenfaces, n_components=None, batch_size=1024):
+        self.projection = np.ascontiguousarray(eigenfaces.components_[:n_components].T)
+        # (images - mean) @ projection without the centered copy of the images
+        self.mean_projection = eigenfaces.mean_ @ self.projection
+        self.batch_size = batch_size
+
+    def project(self, images):
+        return np.asarray(images, dtype=float) @ self.projection - self.mean_projection
+
+    def build(self, images, labels):
+        """
+            Projects images (e.g. a memory-mapped dataset, batch_size images at a time) and builds the index.
+        """
+        self.projected_ = np.concatenate([self.project(images[batch])
+                                          for batch in gen_batches(len(images), self.batch_size)])
+        self.labels_ = np.asarray(labels)
+        self.neighbors_ = NearestNeighbors().fit(self.projected_)
+        return self
+
+    def query(self, images, n_neighbors=5):
+        """
+            Distances, indices and labels of the n_neighbors nearest faces of every image, shape (len(images),
+            n_neighbors) each.
+        """
+        distances, indices = self.neighbors_.kneighbors(self.project(images), n_neighbors)
+        return distances, indices, self.labels_[indices]
+
+
+def benchmark(index, images, batch_sizes, n_neighbors=5, repeats=10):
+    """
+        Median latency of a query of a batch and the throughput in images per second for every batch size. The batches
+        are taken from images, repeated if there are not enough of them. Returns rows (batch size, latency,
+        throughput).
+    """
+    results = []
+    for batch_size in batch_sizes:
+        batch = np.asarray(images[np.arange(batch_size) % len(images)])
+        index.query(batch, n_neighbors)     # warm-up
+
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            index.query(batch, n_neighbors)
+            times.append(time.perf_counter() - start)
+        latency = np.median(times)
+
+        print(f'batch: {batch_size:5}, latency: {latency * 1000:9.3f} ms, throughput: {batch_size / latency:10.1f} '
+              f'images/s')
+        results.append((batch_size, latency, batch_size / latency))
+    return np.array(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Builds the index of the dataset cached by ingest_images with the '
+                                                 'saved EigenFaces and reports the query latency and throughput.')
+    parser.add_argument('--cache-dir', default='cache')
+    parser.add_argument('--model', default=None, help='saved EigenFaces, <cache dir>/eigenfaces.npz by default')
+    parser.add_argument('--components', type=int, default=16)
+    parser.add_argument('--neighbors', type=int, default=5)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 256, 4096])
+    args = parser.parse_args()
+
+    data, labels, _ = load_dataset(args.cache_dir)
+    model_path = args.model if args.model is not None else os.path.join(args.cache_dir, 'eigenfaces.npz')
+    eigenfaces = EigenFaces.load(model_path)
+    index = FaceIndex(eigenfaces, args.components).build(data, labels)
+    benchmark(index, data, args.batch_sizes, args.neighbors)
@@ -0,0 +1,119 @@
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image, ImageOps
+
+image_extensions = ('.jpg', '.jpeg', '.png')
+chunk_size = 1024   # rows copied from the previous cache at once
+
+# memory-mapped matrix of a worker process, set by init_worker
+worker_data = {}
+
+
+def load_image(path, shape):
+    # grayscale image rotated according to its EXIF orientation and resized to shape (rows, columns)
+    image = Image.open(path).convert('L')
+    image = ImageOps.exif_transpose(image)
+    image = image.resize((shape[1], shape[0]))
+    return np.asarray(image)
+
+
+def label_from_name(image_name):
+    return image_name.split('_')[0]
+
+
+def cache_paths(cache_dir):
+    return {name: os.path.join(cache_dir, name) for name in ['images.npy', 'labels.npy', 'manifest.json']}
+
+
+def read_manifest(cache_dir):
+    path = cache_paths(cache_dir)['manifest.json']
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def load_dataset(cache_dir, mmap_mode='r'):
+    """
+        Flattened images (one per row), their labels and the shape of a single image from the cache written by
+        ingest_images. The images are memory-mapped unless mmap_mode is None.
+    """
+    paths = cache_paths(cache_dir)
+    manifest = read_manifest(cache_dir)
+    if manifest is None:
+        raise FileNotFoundError(f'No dataset cache in {cache_dir}, run ingest_images first')
+    return np.load(paths['images.npy'], mmap_mode=mmap_mode), np.load(paths['labels.npy']), tuple(manifest['shape'])
+
+
+def init_worker(matrix_path, shape):
+    worker_data['matrix'] = np.load(matrix_path, mmap_mode='r+')
+    worker_data['shape'] = shape
+
+
+def ingest_image(task):
+    row, path = task
+    worker_data['matrix'][row] = load_image(path, worker_data['shape']).ravel()
+    return row
+
+
+def ingest_images(source_dir, cache_dir, shape=(128, 128), dtype=np.uint8, processes=None):
+    """
+        Decodes and resizes all the images from source_dir on a process pool and writes them straight into a
+        memory-mapped (n_images, rows * columns) matrix of dtype in cache_dir, with the labels (see label_from_name)
+        and a manifest of the source files next to it. The images are sorted by file name.
+
+        On a rerun only the new and modified files (by size and modification time) are decoded again, the other rows
+        are copied from the previous cache. Returns load_dataset(cache_dir).
+    """
+    names = sorted(name for name in os.listdir(source_dir) if name.lower().endswith(image_extensions))
+    files = []
+    for name in names:
+        stat = os.stat(os.path.join(source_dir, name))
+        files.append({'name': name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+
+    paths = cache_paths(cache_dir)
+    manifest = read_manifest(cache_dir)
+    cached_rows = {}    # unchanged file name -> row in the previous cache
+    if manifest is not None and manifest['shape'] == list(shape) and manifest['dtype'] == np.dtype(dtype).str:
+        cached_files = {file['name']: (row, file) for row, file in enumerate(manifest['files'])}
+        cached_rows = {file['name']: cached_files[file['name']][0] for file in files
+                       if cached_files.get(file['name'], (None, None))[1] == file}
+        if manifest['files'] == files:
+            return load_dataset(cache_dir)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    matrix_path = paths['images.npy'] + '.tmp'
+    matrix = np.lib.format.open_memmap(matrix_path, mode='w+', dtype=dtype, shape=(len(files), shape[0] * shape[1]))
+
+    unchanged = [(row, cached_rows[file['name']]) for row, file in enumerate(files) if file['name'] in cached_rows]
+    if len(unchanged) > 0:
+        cached_matrix = np.load(paths['images.npy'], mmap_mode='r')
+        for start in range(0, len(unchanged), chunk_size):
+            rows, cached = np.array(unchanged[start:start + chunk_size]).T
+            matrix[rows] = cached_matrix[cached]
+        del cached_matrix
+    matrix.flush()
+    del matrix
+
+    tasks = [(row, os.path.join(source_dir, file['name'])) for row, file in enumerate(files)
+             if file['name'] not in cached_rows]
+    if len(tasks) > 0:
+        with Pool(processes, initializer=init_worker, initargs=(matrix_path, shape)) as pool:
+            for _ in pool.imap_unordered(ingest_image, tasks, chunksize=16):
+                pass
+
+    with open(paths['labels.npy'] + '.tmp', 'wb') as file:
+        np.save(file, np.array([label_from_name(name) for name in names]))
+    with open(paths['manifest.json'] + '.tmp', 'w') as file:
+        json.dump({'shape': list(shape), 'dtype': np.dtype(dtype).str, 'files': files}, file)
+
+    # the manifest goes last, so an interrupted ingestion is never taken for a valid cache
+    if manifest is not None:
+        os.remove(paths['manifest.json'])
+    os.replace(matrix_path, paths['images.npy'])
+    os.replace(paths['labels.npy'] + '.tmp', paths['labels.npy'])
+    os.replace(paths['manifest.json'] + '.tmp', paths['manifest.json'])
+    return load_dataset(cache_dir)
@@ -0,0 +1,100 @@
+import numpy as np
+from sklearn.cluster import kmeans_plusplus
+from sklearn.utils import check_random_state
+
+
+def total_random(X, n_clusters, random_state):
+    # centers drawn uniformly from the bounding box of the data
+    col_min = np.amin(X, axis=0)
+    col_max = np.amax(X, axis=0)
+    n_cols = X.shape[1]
+    return random_state.uniform(low=col_min, high=col_max, size=(n_clusters, n_cols))
+
+
+def init_centers(X, n_clusters, init, random_state):
+    """
+        Initial centers like in sklearn.cluster.KMeans: init is 'k-means++', 'random', a callable
+        init(X, n_clusters, random_state) or an array of centers.
+    """
+    if isinstance(init, str) and init == 'k-means++':
+        return kmeans_plusplus(X, n_clusters, random_state=random_state)[0]
+    if isinstance(init, str) and init == 'random':
+        # uniform p like the sample weights in KMeans, choice draws differently without it
+        return X[random_state.choice(len(X), size=n_clusters, replace=False, p=np.full(len(X), 1 / len(X)))]
+    if callable(init):
+        return np.asarray(init(X, n_clusters, random_state=random_state), dtype=float)
+    return np.array(init, dtype=float)
+
+
+def assign(X, centers):
+    # labels of the nearest centers and the squared distances to them
+    squared = np.einsum('ij,ij->i', X, X)[:, np.newaxis] - 2 * X @ centers.T + np.einsum('ij,ij->i', centers, centers)
+    labels = np.argmin(squared, axis=1)
+    return labels, np.maximum(squared[np.arange(len(X)), labels], 0)
+
+
+def inertia(X, labels, centers):
+    # sum of the squared distances of the points to their centers
+    return np.sum(np.square(X - centers[labels]))
+
+
+def update_centers(X, labels, distances, centers):
+    """
+        Means of the clusters. Empty clusters get the points farthest from their centers, which are removed from their
+        old clusters, like in sklearn.cluster.KMeans. A cluster which loses its only point this way keeps its center.
+    """
+    n_clusters = len(centers)
+    sums = np.zeros((n_clusters, X.shape[1]))
+    np.add.at(sums, labels, X)
+    counts = np.bincount(labels, minlength=n_clusters).astype(float)
+
+    empty = np.flatnonzero(counts == 0)
+    if len(empty) > 0:
+        far_from_centers = np.argpartition(distances, -len(empty))[:-len(empty) - 1:-1]
+        for cluster, point in zip(empty, far_from_centers):
+            sums[labels[point]] -= X[point]
+            counts[labels[point]] -= 1
+            sums[cluster] = X[point]
+            counts[cluster] = 1
+
+    return np.divide(sums, counts[:, np.newaxis], out=centers.copy(), where=counts[:, np.newaxis] > 0)
+
+
+def lloyd_iterations(X, n_clusters, init='k-means++', max_iter=300, tol=1e-4, random_state=None):
+    """
+        Lloyd's K-means, the same algorithm as KMeans(algorithm='lloyd', n_init=1). Yields (labels, centers) after
+        every iteration, the labels are assigned to the updated centers. The results can differ from a KMeans fitted
+        with max_iter=i, e.g. when an empty cluster is relocated and there are ties between the farthest points
+        (KMeans works on centered data). Stops after max_iter iterations or when the labels do not change or the
+        centers move less than tol (relative to the mean variance of the features).
+    """
+    X = np.asarray(X, dtype=float)
+    random_state = check_random_state(random_state)
+    tol = np.mean(np.var(X, axis=0)) * tol
+
+    centers = init_centers(X, n_clusters, init, random_state)
+    labels, distances = assign(X, centers)
+    for _ in range(max_iter):
+        new_centers = update_centers(X, labels, distances, centers)
+        new_labels, distances = assign(X, new_centers)
+        yield new_labels, new_centers
+
+        converged = np.array_equal(new_labels, labels) or np.sum(np.square(new_centers - centers)) <= tol
+        labels, centers = new_labels, new_centers
+        if converged:
+            return
+
+
+def iteration_scores(X, n_clusters, metric, init='k-means++', max_iter=300, random_state=None):
+    """
+        metric(X, labels) after each of max_iter iterations from a single run of lloyd_iterations. After convergence
+        the clustering does not change, so the last score is repeated.
+    """
+    X = np.asarray(X, dtype=float)
+    scores = np.empty(max_iter)
+    n_iter = 0
+    for n_iter, (labels, _) in enumerate(lloyd_iterations(X, n_clusters, init, max_iter,
+                                                          random_state=random_state), 1):
+        scores[n_iter - 1] = metric(X, labels)
+    scores[n_iter:] = scores[n_iter - 1]
+    return scores
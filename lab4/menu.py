@@ -0,0 +1,121 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+daily_value_suffix = ' (% Daily Value)'
+# not features: Item and Category, redundant: Calories from Fat (correlated with Total Fat)
+irrelevant_columns = ['Item', 'Category', 'Calories from Fat']
+dtype = np.float32
+
+# serving sizes in grams: '4.8 oz (136 g)', in fluid ounces: '12 fl oz cup', '16.9 fl oz', '6 fl oz (177 ml)' and in
+# milliliters: '1 carton (236 ml)', the first matching pattern is used
+grams_per_unit = {
+    r'\((\d+(?:\.\d+)?) g\)': 1.,
+    r'^(\d+(?:\.\d+)?) fl oz': 29.57,
+    r'\((\d+(?:\.\d+)?) ml\)': 1.04,     # assume 1 ml of milk = 1.04 g
+}
+
+
+def serving_size_weights(sizes, dtype=dtype):  # [g]
+    """
+        Weights of a Series of serving sizes (see grams_per_unit) as dtype, parsed with vectorized regular expressions.
+    """
+    weights = pd.Series(np.nan, index=sizes.index)
+    for pattern, grams in grams_per_unit.items():
+        missing = weights.isna()
+        weights[missing] = sizes[missing].str.extract(pattern, expand=False).astype(float) * grams
+    if weights.isna().any():
+        raise ValueError(f'Unknown serving sizes: {list(sizes[weights.isna()].unique())}')
+    return weights.astype(dtype)
+
+
+def weight_from_serving_size(size):  # [g]
+    return float(serving_size_weights(pd.Series([size]), dtype=float)[0])
+
+
+def daily_value_columns(columns):
+    # % Daily Value columns of the nutrients given also in units (the vitamins and minerals are only in % Daily Value)
+    return [column + daily_value_suffix for column in columns if column + daily_value_suffix in columns]
+
+
+def feature_columns(columns):
+    dropped = set(irrelevant_columns + daily_value_columns(columns))
+    return [column for column in columns if column not in dropped]
+
+
+def column_dtypes(columns):
+    # dtypes of the columns read from menu.csv, declared up front instead of inferred
+    dtypes = {column: dtype for column in feature_columns(columns)}
+    dtypes.update({'Item': str, 'Category': str, 'Serving Size': str})
+    return dtypes
+
+
+def clean_menu(menu):
+    """
+        Features of the items of a menu.csv frame: the feature_columns, the serving size in grams, all float32.
+    """
+    features = menu[feature_columns(menu.columns)]
+    return features.assign(**{'Serving Size': serving_size_weights(features['Serving Size'])}).astype(dtype)
+
+
+def read_menu(path, chunksize=None):
+    """
+        (features, items, categories) of menu.csv, see clean_menu. Only the needed columns are read, with the dtypes
+        of column_dtypes. With chunksize, yields them for consecutive chunks of chunksize rows instead.
+    """
+    columns = list(pd.read_csv(path, nrows=0).columns)
+    dtypes = column_dtypes(columns)
+    reader = pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize)
+    if chunksize is None:
+        return clean_menu(reader), reader['Item'], reader['Category']
+    return ((clean_menu(menu), menu['Item'], menu['Category']) for menu in reader)
+
+
+def read_menu_chunks(path, chunksize=1024):
+    """
+        Yields (features, items, categories) of the consecutive chunks of chunksize rows of menu.csv.
+    """
+    return read_menu(path, chunksize)
+
+
+def cache_paths(cache_dir):
+    return {name: os.path.join(cache_dir, name)
+            for name in ['features.npy', 'items.npy', 'categories.npy', 'manifest.json']}
+
+
+def load_menu(path, cache_dir):
+    """
+        read_menu(path) cached in cache_dir: the features are saved as a column-major (Fortran order) float32 .npy, so
+        they are loaded as the columns of the frame without parsing or copying, with the items, categories and a
+        manifest of the source file. The cache is written again when the size or modification time of path changes.
+    """
+    stat = os.stat(path)
+    source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    paths = cache_paths(cache_dir)
+
+    manifest = None
+    if os.path.exists(paths['manifest.json']):
+        with open(paths['manifest.json']) as file:
+            manifest = json.load(file)
+    if manifest is not None and manifest['source'] == source and manifest['dtype'] == np.dtype(dtype).str:
+        features = pd.DataFrame(np.load(paths['features.npy']), columns=manifest['columns'], copy=False)
+        items = pd.Series(np.load(paths['items.npy']), name='Item', dtype=str)
+        categories = pd.Series(np.load(paths['categories.npy']), name='Category', dtype=str)
+        return features, items, categories
+
+    features, items, categories = read_menu(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    arrays = {'features.npy': np.asfortranarray(features.to_numpy(dtype=dtype)),
+              'items.npy': items.to_numpy(dtype=str), 'categories.npy': categories.to_numpy(dtype=str)}
+    for name, array in arrays.items():
+        with open(paths[name] + '.tmp', 'wb') as file:
+            np.save(file, array)
+    with open(paths['manifest.json'] + '.tmp', 'w') as file:
+        json.dump({'source': source, 'dtype': np.dtype(dtype).str, 'columns': list(features.columns)}, file)
+    # the manifest last: a cache interrupted while writing is not used
+    for name in arrays:
+        os.replace(paths[name] + '.tmp', paths[name])
+    os.replace(paths['manifest.json'] + '.tmp', paths['manifest.json'])
+    return features, items, categories
@@ -0,0 +1,117 @@
+import numpy as np
+import sklearn.metrics
+from sklearn.metrics import pairwise_distances
+from sklearn.utils import check_random_state
+
+block_size = 1024           # rows of the distance matrix computed at once
+max_cache_bytes = 2 ** 28   # distance rows kept between calls
+
+
+class ClusterScorer:
+    """
+        Cluster quality scores of many labelings of the same dataset X, usable as metric(X, labels) in place of the
+        sklearn.metrics functions. Only the shape of the X passed to a call is checked, the scores are always of the X
+        given to the constructor.
+
+        metric - 'calinski_harabasz', 'davies_bouldin' (both O(n k), computed with sklearn) or 'silhouette'.
+        sample_size - None: exact scores. A number: silhouette is estimated from the silhouette values of a fixed
+        random sample of points (the other metrics are still exact), post-stratified by the clusters.
+
+        The silhouette values of a set of points need their distances to all the points. These distance rows (all of
+        them in the exact mode, the sample ones in the sampled mode) are computed once per dataset and reused by every
+        labeling, if they take at most max_cache_bytes, otherwise block by block in every call.
+    """
+
+    def __init__(self, X, metric='calinski_harabasz', sample_size=None, random_state=None):
+        self.X = np.asarray(X, dtype=float)
+        self.metric = metric
+        self.sample_size = sample_size
+
+        if sample_size is None or sample_size >= len(self.X):
+            self.rows = np.arange(len(self.X))
+        else:
+            self.rows = np.sort(check_random_state(random_state).choice(len(self.X), sample_size, replace=False))
+        self.distances = None
+
+    def __getstate__(self):
+        # the cached distances are computed again instead of being sent to other processes
+        state = self.__dict__.copy()
+        state['distances'] = None
+        return state
+
+    def __call__(self, X, labels):
+        if np.shape(X) != self.X.shape:
+            raise ValueError(f'ClusterScorer built for X of shape {self.X.shape}, got {np.shape(X)}')
+        return self.estimate(labels)[0]
+
+    def estimate(self, labels):
+        """
+            The score and its error bound: 0 for exact scores, about 95% confidence for the sampled silhouette.
+        """
+        labels = np.asarray(labels)
+        if self.metric == 'calinski_harabasz':
+            return sklearn.metrics.calinski_harabasz_score(self.X, labels), 0.
+        if self.metric == 'davies_bouldin':
+            return sklearn.metrics.davies_bouldin_score(self.X, labels), 0.
+        if self.metric == 'silhouette':
+            return self.silhouette(labels)
+        raise ValueError(f'Unknown metric: {self.metric}')
+
+    def distance_blocks(self):
+        # (start, distances of self.rows[start:start + block_size] to all the points)
+        if self.distances is not None:
+            yield 0, self.distances
+            return
+        if len(self.rows) * len(self.X) * 8 <= max_cache_bytes:
+            self.distances = pairwise_distances(self.X[self.rows], self.X)
+            yield 0, self.distances
+            return
+        for start in range(0, len(self.rows), block_size):
+            yield start, pairwise_distances(self.X[self.rows[start:start + block_size]], self.X)
+
+    def silhouette_values(self, labels):
+        """
+            Silhouette values of the points self.rows, the same as sklearn.metrics.silhouette_samples.
+        """
+        classes, labels = np.unique(labels, return_inverse=True)
+        one_hot = np.zeros((len(labels), len(classes)))
+        one_hot[np.arange(len(labels)), labels] = 1
+        counts = one_hot.sum(axis=0)
+
+        values = np.empty(len(self.rows))
+        for start, distances in self.distance_blocks():
+            rows = self.rows[start:start + len(distances)]
+            own = labels[rows]
+            # mean distance to the other points of the own cluster and to the points of every other cluster
+            sums = distances @ one_hot
+            a = sums[np.arange(len(rows)), own] / np.maximum(counts[own] - 1, 1)
+            means = sums / counts
+            means[np.arange(len(rows)), own] = np.inf
+            b = means.min(axis=1)
+            with np.errstate(invalid='ignore'):
+                block_values = (b - a) / np.maximum(a, b)
+            # 0 for points alone in their clusters
+            values[start:start + len(rows)] = np.where(counts[own] > 1, np.nan_to_num(block_values), 0)
+        return values
+
+    def silhouette(self, labels):
+        labels = np.asarray(labels)
+        values = self.silhouette_values(labels)
+        if len(self.rows) == len(self.X):
+            return np.mean(values), 0.
+
+        # post-stratified mean: every cluster weighted by its size, not by the number of its sampled points
+        estimate, variance, unsampled = 0., 0., 0.
+        sample_labels = labels[self.rows]
+        for cluster in np.unique(labels):
+            weight = np.mean(labels == cluster)
+            cluster_values = values[sample_labels == cluster]
+            if len(cluster_values) == 0:
+                # the silhouette values are in [-1, 1]
+                unsampled += weight
+                continue
+            cluster_size = weight * len(labels)
+            cluster_variance = np.var(cluster_values, ddof=1) if len(cluster_values) > 1 else 1.
+            estimate += weight * np.mean(cluster_values)
+            variance += weight ** 2 * cluster_variance / len(cluster_values) * (1 - len(cluster_values) / cluster_size)
+        return estimate, 1.96 * np.sqrt(variance) + unsampled
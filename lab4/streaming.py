@@ -0,0 +1,78 @@
+import numpy as np
+from sklearn.utils import check_random_state
+
+from kmeans import assign, init_centers
+
+
+class StreamingKMeans:
+    """
+        Mini-batch K-means of standardized data arriving in chunks, in constant memory.
+
+        The mean and variance of the features are updated with every chunk (Chan's parallel version of Welford's
+        algorithm), like a StandardScaler fitted on all the data seen so far. The centers are kept in the original
+        units: the distances between standardized points do not depend on the mean, so the centers stay valid when
+        the statistics change, and only the current scale is applied when assigning points.
+
+        Every chunk is one mini-batch step: its points are assigned to the nearest centers and every center moves
+        towards the mean of its points with the learning rate 1 / (number of points assigned to it so far), as in
+        sklearn.cluster.MiniBatchKMeans. The first chunk (at least n_clusters rows) initializes the centers with init,
+        the same options as in lloyd_iterations, on the standardized chunk.
+    """
+
+    def __init__(self, n_clusters, init='k-means++', random_state=None):
+        self.n_clusters = n_clusters
+        self.init = init
+        self.random_state = check_random_state(random_state)
+
+        self.n_samples_ = 0
+        self.mean_ = 0.
+        self.m2_ = 0.
+        self.cluster_centers_ = None
+        self.counts_ = np.zeros(n_clusters)
+
+    @property
+    def scale_(self):
+        # like in StandardScaler: constant features are not scaled
+        scale = np.sqrt(self.m2_ / self.n_samples_)
+        return np.where(scale > 0, scale, 1.)
+
+    def update_statistics(self, chunk):
+        chunk_mean = chunk.mean(axis=0)
+        chunk_m2 = np.sum(np.square(chunk - chunk_mean), axis=0)
+        total = self.n_samples_ + len(chunk)
+        delta = chunk_mean - self.mean_
+        self.mean_ = self.mean_ + delta * len(chunk) / total
+        self.m2_ = self.m2_ + chunk_m2 + np.square(delta) * self.n_samples_ * len(chunk) / total
+        self.n_samples_ = total
+
+    def standardize(self, X):
+        return (np.asarray(X, dtype=float) - self.mean_) / self.scale_
+
+    def partial_fit(self, chunk):
+        chunk = np.asarray(chunk, dtype=float)
+        self.update_statistics(chunk)
+
+        if self.cluster_centers_ is None:
+            if len(chunk) < self.n_clusters:
+                raise ValueError(f'The first chunk has {len(chunk)} rows, at least n_clusters={self.n_clusters} are '
+                                 f'needed to initialize the centers')
+            centers = init_centers(self.standardize(chunk), self.n_clusters, self.init, self.random_state)
+            self.cluster_centers_ = centers * self.scale_ + self.mean_
+
+        labels = self.predict(chunk)
+        sums = np.zeros_like(self.cluster_centers_)
+        np.add.at(sums, labels, chunk)
+        batch_counts = np.bincount(labels, minlength=self.n_clusters)
+        self.counts_ += batch_counts
+
+        assigned = batch_counts > 0
+        self.cluster_centers_[assigned] += (sums[assigned] - batch_counts[assigned, np.newaxis]
+                                            * self.cluster_centers_[assigned]) / self.counts_[assigned, np.newaxis]
+        return self
+
+    def predict(self, X):
+        """
+            Clusters of new points, without changing the model.
+        """
+        scale = self.scale_
+        return assign(np.asarray(X, dtype=float) / scale, self.cluster_centers_ / scale)[0]
@@ -0,0 +1,110 @@
+import os
+import tempfile
+from multiprocessing import Pool, Value
+
+import numpy as np
+from sklearn.cluster import KMeans
+from threadpoolctl import threadpool_limits
+
+from kmeans import assign, inertia, lloyd_iterations
+
+# data of a worker process, set by init_worker
+worker_data = {}
+
+
+def restart_seeds(random_state, n_restarts):
+    # independent seeds of the restarts, derived deterministically from random_state
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(random_state).spawn(n_restarts)]
+
+
+def init_worker(data_dir, best_inertia=None):
+    # the matrix is memory-mapped, not pickled with every task
+    worker_data['X'] = np.load(os.path.join(data_dir, 'X.npy'), mmap_mode='r')
+    worker_data['best_inertia'] = best_inertia
+    # the fits run in parallel already
+    threadpool_limits(1)
+
+
+def run_on_pool(X, function, tasks, processes=None, best_inertia=None):
+    # imap_unordered of function over tasks with X saved to a temporary file shared by the workers
+    with tempfile.TemporaryDirectory() as data_dir:
+        np.save(os.path.join(data_dir, 'X.npy'), np.asarray(X, dtype=float))
+        with Pool(processes, initializer=init_worker, initargs=(data_dir, best_inertia)) as pool:
+            yield from pool.imap_unordered(function, tasks)
+
+
+def fit_task(task):
+    """
+        A single KMeans fit, only its centers, inertia and metric score are sent back.
+    """
+    key, n_clusters, init, max_iter, seed, metric = task
+    X = worker_data['X']
+    kmeans = KMeans(n_clusters=n_clusters, init=init, n_init=1, max_iter=max_iter, random_state=seed)
+    kmeans.fit(X)
+    score = metric(X, kmeans.labels_) if metric is not None else np.nan
+    return key, kmeans.cluster_centers_, kmeans.inertia_, score
+
+
+def k_sweep(X, n_clusters_arr, random_states, n_restarts, metric, init='k-means++', max_iter=300, processes=None):
+    """
+        Fits KMeans n_restarts times for every number of clusters in n_clusters_arr, every fit is a separate task on a
+        process pool. The seeds of the restarts of n_clusters_arr[i] are derived from random_states[i], so the results
+        do not depend on the number of processes. Returns the metric scores and inertias of shape
+        (len(n_clusters_arr), n_restarts) and the centers of every fit, centers[i][restart].
+    """
+    tasks = [((i, restart), n_clusters, init, max_iter, seed, metric)
+             for i, (n_clusters, random_state) in enumerate(zip(n_clusters_arr, random_states))
+             for restart, seed in enumerate(restart_seeds(random_state, n_restarts))]
+
+    scores = np.empty((len(n_clusters_arr), n_restarts))
+    inertias = np.empty((len(n_clusters_arr), n_restarts))
+    centers = [[None] * n_restarts for _ in n_clusters_arr]
+    for (i, restart), fit_centers, fit_inertia, score in run_on_pool(X, fit_task, tasks, processes):
+        centers[i][restart], inertias[i, restart], scores[i, restart] = fit_centers, fit_inertia, score
+    return scores, inertias, centers
+
+
+def restart_task(task):
+    """
+        A single K-means run. With prune_ratio, the run is abandoned as soon as its inertia is above prune_ratio times
+        the best final inertia of the finished restarts, and None is returned instead of its centers.
+    """
+    restart, n_clusters, init, max_iter, seed, prune_ratio = task
+    X = np.asarray(worker_data['X'])
+    best_inertia = worker_data['best_inertia']
+
+    centers, run_inertia = None, np.inf
+    for labels, centers in lloyd_iterations(X, n_clusters, init, max_iter, random_state=seed):
+        run_inertia = inertia(X, labels, centers)
+        if prune_ratio is not None and run_inertia > prune_ratio * best_inertia.value:
+            return restart, None, run_inertia
+
+    with best_inertia.get_lock():
+        best_inertia.value = min(best_inertia.value, run_inertia)
+    return restart, centers, run_inertia
+
+
+def best_restart(X, n_clusters, n_restarts, init='k-means++', max_iter=300, random_state=None, prune_ratio=None,
+                 processes=None):
+    """
+        Best of n_restarts K-means runs (like KMeans(n_init=n_restarts)), the restarts run in parallel on a process
+        pool with seeds derived from random_state. Returns the centers, labels and inertia of the best run.
+
+        prune_ratio - if set, a restart stops early once its inertia is above prune_ratio times the best final inertia
+        found so far. This is a heuristic: the inertia of a run only decreases, but a pruned run may still have ended
+        below the best, so pruning can change which restart wins. The best final inertia so far depends on the order in
+        which the restarts finish on the pool, so with pruning the result may differ between runs and numbers of
+        processes. None: every restart runs to the end and the result is deterministic.
+    """
+    tasks = [(restart, n_clusters, init, max_iter, seed, prune_ratio)
+             for restart, seed in enumerate(restart_seeds(random_state, n_restarts))]
+
+    runs = [None] * n_restarts
+    for restart, centers, run_inertia in run_on_pool(X, restart_task, tasks, processes, Value('d', np.inf)):
+        runs[restart] = (run_inertia, centers)
+
+    # the first of equally good restarts, in the order of the seeds
+    best = min((run for run in runs if run[1] is not None), key=lambda run: run[0])
+    best_inertia, centers = best
+    labels, _ = assign(np.asarray(X, dtype=float), centers)
+    return centers, labels, best_inertia
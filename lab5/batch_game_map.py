@@ -0,0 +1,161 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from game_map import DIRECTION_INDEX, DIRECTIONS, GameMap
+from tlareg import Tlareg
+from utils import Action, Direction, GameParameters
+
+
+@dataclass
+class BatchStep:
+    """
+        Result of a single turn of every game in the batch. All fields are arrays of shape (n_games,).
+    """
+    reward: np.ndarray
+    done: np.ndarray
+    tlareg_dead: np.ndarray  # Tlareg did not hit Striga for tlareg_counter_start turns
+    tlareg_killed: np.ndarray  # Striga hit Tlareg or Tlareg walked into Striga
+    striga_hit: np.ndarray
+    striga_killed: np.ndarray
+
+
+class BatchGameMap:
+    """
+        N independent games played in lockstep against StrigaStochastic. The state of every game is kept in NumPy
+        arrays of cell indices (see GameMap.cell_index) and the rules are the same as in GameMap, StrigaStochastic and
+        Tlareg.learning_episode. Terminal events are reported as masks in BatchStep instead of raised exceptions.
+    """
+
+    def __init__(self, game_map: GameMap, config: GameParameters, n_games: int, attack_probability: float = 0.15,
+                 prev_direction: Direction = Direction.UP, rng: np.random.Generator = None):
+        self.config = config
+        self.n_games = n_games
+        self.attack_probability = attack_probability
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self.width = game_map.width
+        self.tlareg_start = game_map.cell_index(game_map.tlareg)
+        self.striga_start = game_map.cell_index(game_map.striga)
+        self.castle = game_map.cell_index(game_map.castle)
+        self.start_momentum = DIRECTION_INDEX[game_map.striga_momentum]
+        self.start_prev_direction = DIRECTION_INDEX[prev_direction]
+
+        cells = np.arange(game_map.n_cells)
+        self.cell_x = cells % self.width
+        self.cell_y = cells // self.width
+
+        # neighbors[cell, direction] is the cell reached by moving in the direction, -1 if the move is not possible
+        self.neighbors = game_map.neighbors
+        self.direction_x = np.array([direction.value[0] for direction in DIRECTIONS])
+        self.direction_y = np.array([direction.value[1] for direction in DIRECTIONS])
+
+        self.castle_exits = game_map.castle_exits
+
+        self.tlareg = np.empty(n_games, dtype=int)
+        self.striga = np.empty(n_games, dtype=int)
+        self.striga_momentum = np.empty(n_games, dtype=int)
+        self.prev_direction = np.empty(n_games, dtype=int)
+        self.tlareg_counter = np.empty(n_games, dtype=int)
+        self.striga_lives = np.empty(n_games, dtype=int)
+        self.striga_castle_counter = np.empty(n_games, dtype=int)
+        self.reset()
+
+    def reset(self, mask: np.ndarray = None):
+        if mask is None:
+            mask = np.ones(self.n_games, dtype=bool)
+        self.tlareg[mask] = self.tlareg_start
+        self.striga[mask] = self.striga_start
+        self.striga_momentum[mask] = self.start_momentum
+        self.prev_direction[mask] = self.start_prev_direction
+        self.tlareg_counter[mask] = self.config.tlareg_counter_start
+        self.striga_lives[mask] = self.config.striga_lives
+        self.striga_castle_counter[mask] = 0
+
+    def step(self, actions: np.ndarray) -> BatchStep:
+        """
+            Plays one turn of every game. actions holds Action.index values, it is assumed that the moves are possible.
+        """
+        reward = np.zeros(self.n_games)
+
+        # Tlareg
+        self.tlareg_counter -= 1
+        tlareg_dead = self.tlareg_counter == 0
+        alive = ~tlareg_dead
+
+        dx = self.cell_x[self.tlareg] - self.cell_x[self.striga]
+        dy = self.cell_y[self.tlareg] - self.cell_y[self.striga]
+        prev_dist = np.abs(dx) + np.abs(dy)
+
+        attacking = alive & (actions == Action.ATTACK.index)
+        striga_hit = attacking & (np.maximum(np.abs(dx), np.abs(dy)) == 1)
+        reward[attacking & ~striga_hit] = Tlareg.TLAREG_MISSED_REWARD
+
+        moving = alive & ~attacking
+        directions = np.where(moving, actions, 0)
+        new_dist = np.abs(dx + self.direction_x[directions]) + np.abs(dy + self.direction_y[directions])
+        reward[moving] = np.where(new_dist[moving] < prev_dist[moving],
+                                  Tlareg.GETTING_CLOSER_REWARD, Tlareg.NOT_GETTING_CLOSER_REWARD)
+        self.tlareg[moving] = self.neighbors[self.tlareg[moving], directions[moving]]
+        tlareg_killed = moving & (self.tlareg == self.striga)
+
+        self.tlareg_counter[striga_hit] = self.config.tlareg_counter_start
+        self.striga_lives[striga_hit] -= 1
+        striga_killed = striga_hit & (self.striga_lives == 0)
+        to_castle = striga_hit & ~striga_killed
+        self.striga[to_castle] = self.castle
+        self.striga_castle_counter[to_castle] = self.config.striga_castle_time
+        reward[to_castle] += Tlareg.STRIGA_HIT_REWARD
+
+        # Striga
+        playing = ~(tlareg_dead | tlareg_killed | striga_killed)
+        in_castle = playing & (self.striga_castle_counter > 0)
+        self.striga_castle_counter[in_castle] -= 1
+        self.leave_castle(in_castle & (self.striga_castle_counter == 0))
+
+        striga_turn = playing & ~in_castle
+        striga_attacking = striga_turn & (self.rng.random(self.n_games) < self.attack_probability)
+        tlareg_killed |= striga_attacking & self.is_attacked_by_striga()
+        self.move_striga(striga_turn & ~striga_attacking)
+
+        reward[tlareg_dead] = Tlareg.TLAREG_DEAD_REWARD
+        reward[tlareg_killed] = Tlareg.TLAREG_KILLED_REWARD
+        reward[striga_killed] = Tlareg.STRIGA_KILLED_REWARD
+        done = tlareg_dead | tlareg_killed | striga_killed
+        return BatchStep(reward, done, tlareg_dead, tlareg_killed, striga_hit, striga_killed)
+
+    def is_attacked_by_striga(self):
+        """
+            Same footprint as GameMap.striga_attack: three cells in front of Striga, across its momentum.
+        """
+        ahead_x = self.cell_x[self.tlareg] - self.cell_x[self.striga] - self.direction_x[self.striga_momentum]
+        ahead_y = self.cell_y[self.tlareg] - self.cell_y[self.striga] - self.direction_y[self.striga_momentum]
+        vertical = self.direction_x[self.striga_momentum] == 0
+        return np.where(vertical, (ahead_y == 0) & (np.abs(ahead_x) <= 1), (ahead_x == 0) & (np.abs(ahead_y) <= 1))
+
+    def move_striga(self, mask: np.ndarray):
+        """
+            Same rules as StrigaStochastic.move: keep the previous direction or pick a random one, bounce off walls and
+            do not enter the field occupied by Tlareg.
+        """
+        keep_direction = self.rng.random(self.n_games) < 0.5
+        random_direction = self.rng.integers(len(DIRECTIONS), size=self.n_games)
+        directions = np.where(keep_direction, self.prev_direction, random_direction)
+        targets = self.neighbors[self.striga, directions]
+        directions = np.where(targets < 0, (directions + 2) % len(DIRECTIONS), directions)  # get_opposite
+        targets = self.neighbors[self.striga, directions]
+
+        moved = mask & (targets >= 0) & (targets != self.tlareg)
+        self.striga[moved] = targets[moved]
+        self.striga_momentum[moved] = directions[moved]
+        self.prev_direction[moved] = directions[moved]
+
+    def leave_castle(self, mask: np.ndarray):
+        """
+            Same rules as GameMap.striga_leave_castle: a random castle exit that is not occupied by Tlareg.
+        """
+        if not mask.any():
+            return
+        allowed = self.castle_exits[np.newaxis, :] != self.tlareg[mask, np.newaxis]
+        picks = (self.rng.random(allowed.shape[0]) * allowed.sum(axis=1)).astype(int)
+        self.striga[mask] = self.castle_exits[np.argmax(np.cumsum(allowed, axis=1) > picks[:, np.newaxis], axis=1)]
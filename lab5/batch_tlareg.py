@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+
+from batch_game_map import BatchGameMap
+from game_map import GameMap
+from utils import Action, GameParameters
+
+
+class BatchTlareg:
+    """
+        A population of independent Tlaregs, each with its own Q table and its own alpha, gamma and eps schedule,
+        learning in lockstep on a BatchGameMap - one game per learner. Useful for hyperparameter sweeps.
+        The learning rule is the same as in TlaregSarsa (sarsa=True) or TlaregQLearning (sarsa=False).
+    """
+
+    def __init__(self, game_map: GameMap, config: GameParameters, n_learners: int, sarsa: bool = False,
+                 attack_probability: float = 0.15, seed: int = None):
+        self.config = config
+        self.n_learners = n_learners
+        self.sarsa = sarsa
+        self.rng = np.random.default_rng(seed)
+        self.batch_map = BatchGameMap(game_map, config, n_learners, attack_probability, rng=self.rng)
+        self.learners = np.arange(n_learners)
+
+        self.valid_actions = self.batch_map.neighbors >= 0
+        self.valid_actions = np.hstack([self.valid_actions, np.ones((game_map.n_cells, 1), dtype=bool)])
+
+        self.Q = None
+
+        self.rewards_data = None
+        self.tlareg_life_time_data = None
+        self.hits_before_death_data = None
+
+    def init_Q(self):
+        n_cells = self.valid_actions.shape[0]
+        self.Q = np.zeros((self.n_learners, n_cells, n_cells, len(Action)))
+        self.Q[np.broadcast_to(~self.valid_actions[np.newaxis, :, np.newaxis, :], self.Q.shape)] = -np.inf
+
+    def state_index(self):
+        """
+            Rows of Q.reshape(-1, len(Action)) holding the current state of every learner.
+        """
+        n_cells = self.valid_actions.shape[0]
+        return (self.learners * n_cells + self.batch_map.tlareg) * n_cells + self.batch_map.striga
+
+    def choose_actions(self, eps, states):
+        """
+            Greedy actions with random tie-breaking, random valid actions with probability eps for Sarsa.
+        """
+        values = self.Q.reshape(-1, len(Action))[states]
+        best = values == values.max(axis=1, keepdims=True)
+        actions = np.argmax(best * self.rng.random(best.shape), axis=1)
+        if self.sarsa:
+            explore = self.rng.random(self.n_learners) < eps
+            valid = self.valid_actions[self.batch_map.tlareg[explore]]
+            actions[explore] = np.argmax(valid * self.rng.random(valid.shape), axis=1)
+        return actions
+
+    def learn(self, n_games=5000, alpha=0.8, gamma=0.6, start_eps=0.8, end_eps=0.1, report_step=500):
+        """
+            Every learner plays n_games games. alpha, gamma, start_eps and end_eps can be scalars or arrays of shape
+            (n_learners,).
+        """
+        alpha = np.broadcast_to(np.asarray(alpha, dtype=float), self.n_learners)
+        gamma = np.broadcast_to(np.asarray(gamma, dtype=float), self.n_learners)
+        start_eps = np.broadcast_to(np.asarray(start_eps, dtype=float), self.n_learners)
+        end_eps = np.broadcast_to(np.asarray(end_eps, dtype=float), self.n_learners)
+        eps_step = (start_eps - end_eps) / (n_games - 1)
+
+        self.rewards_data = np.zeros((self.n_learners, n_games))
+        self.tlareg_life_time_data = np.zeros((self.n_learners, n_games), dtype=int)
+        self.hits_before_death_data = np.zeros((self.n_learners, n_games), dtype=int)
+
+        games = np.zeros(self.n_learners, dtype=int)
+        self.batch_map.reset()
+        eps = start_eps.copy()
+        states = self.state_index()
+        actions = self.choose_actions(eps, states)
+
+        Q = self.Q.reshape(-1, len(Action))
+        reported = 0
+        start_time = time.time()
+        while games.min() < n_games:
+            learning = games < n_games
+            result = self.batch_map.step(actions)
+
+            recorded = self.learners[learning], games[learning]
+            self.rewards_data[recorded] += result.reward[learning]
+            self.hits_before_death_data[recorded] += result.striga_hit[learning]
+            self.tlareg_life_time_data[recorded] += ~result.done[learning]
+
+            finished = result.done & learning
+            games[finished] += 1
+            eps[finished] -= eps_step[finished]
+            # finished games start again from the initial state, their update does not use the next state
+            self.batch_map.reset(result.done)
+
+            next_states = self.state_index()
+            next_actions = self.choose_actions(eps, next_states)
+            target = np.where(result.done, result.reward, result.reward + gamma * Q[next_states, next_actions])
+            Q[states, actions] += np.where(learning, alpha * (target - Q[states, actions]), 0)
+            states, actions = next_states, next_actions
+
+            if games.min() >= reported + report_step:
+                reported = games.min() // report_step * report_step
+                end_time = time.time()
+                print(f'{reported:5} ({end_time - start_time:2.1f} s): eps: {eps.mean():0.2f}')
+                start_time = end_time
@@ -0,0 +1,61 @@
+import random
+import time
+
+from utils import Position, State
+
+map_sizes = [4, 8, 12, 16, 24, 32]
+legacy_max_size = 16  # building the legacy dict for bigger maps takes minutes
+n_lookups = 200_000
+
+
+class LegacyState:
+    """
+        State hashed the way it was before interning: by the sum of both positions.
+    """
+    __slots__ = ('state',)
+
+    def __init__(self, state: State):
+        self.state = state
+
+    def __eq__(self, other):
+        return self.state.tlareg == other.state.tlareg and self.state.striga == other.state.striga
+
+    def __hash__(self):
+        return hash((self.state.tlareg.x + self.state.striga.x, self.state.tlareg.y + self.state.striga.y))
+
+
+def time_lookups(Q, queries, make_key):
+    start_time = time.perf_counter()
+    for tlareg, striga in queries:
+        Q[make_key(tlareg, striga)][0] += 1
+    return (time.perf_counter() - start_time) / len(queries) * 1e9
+
+
+def benchmark(size):
+    positions = [Position(x, y) for x in range(size) for y in range(size)]
+    states = [State(tlareg, striga) for tlareg in positions for striga in positions if tlareg != striga]
+    Q = {state: [0.0] * 5 for state in states}
+
+    queries = [(random.choice(positions), random.choice(positions)) for _ in range(n_lookups)]
+    queries = [(tlareg, striga) for tlareg, striga in queries if tlareg != striga]
+
+    ns_per_lookup = time_lookups(Q, queries, State)
+
+    n_hashes = len({hash(state) for state in states})
+    n_legacy_hashes = len({hash(LegacyState(state)) for state in states})
+
+    legacy_ns_per_lookup = None
+    if size <= legacy_max_size:
+        legacy_Q = {LegacyState(state): [0.0] * 5 for state in states}
+        legacy_ns_per_lookup = time_lookups(legacy_Q, queries, lambda t, s: LegacyState(State(t, s)))
+
+    return len(states), n_hashes, n_legacy_hashes, ns_per_lookup, legacy_ns_per_lookup
+
+
+if __name__ == '__main__':
+    random.seed(1234)
+    print(f'{"map":>7} {"states":>9} {"hashes":>9} {"old hashes":>11} {"ns/lookup":>10} {"old ns/lookup":>14}')
+    for size in map_sizes:
+        n_states, n_hashes, n_legacy_hashes, ns_per_lookup, legacy_ns_per_lookup = benchmark(size)
+        legacy = '-' if legacy_ns_per_lookup is None else f'{legacy_ns_per_lookup:.0f}'
+        print(f'{size:>3}x{size:<3} {n_states:9} {n_hashes:9} {n_legacy_hashes:11} {ns_per_lookup:10.0f} {legacy:>14}')
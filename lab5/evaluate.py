@@ -0,0 +1,106 @@
+import os
+import random
+import time
+from dataclasses import dataclass
+from multiprocessing import Pool
+
+import numpy as np
+
+from game import HeadlessGame
+from game_map import GameMap
+from striga import STRIGAS
+from tlareg import TlaregQLearning, read_checkpoint
+from utils import GameParameters
+
+
+@dataclass
+class Estimate:
+    mean: float
+    ci: float  # half-width of the 95% confidence interval
+
+    def __repr__(self):
+        return f'{self.mean:.4f} ± {self.ci:.4f}'
+
+    @staticmethod
+    def from_samples(samples):
+        samples = np.asarray(samples, dtype=float)
+        return Estimate(samples.mean(), 1.96 * samples.std(ddof=1) / np.sqrt(len(samples)))
+
+
+@dataclass
+class EvaluationResult:
+    n_episodes: int
+    win_rate: Estimate
+    survival_turns: Estimate
+    hits: Estimate
+
+
+def run_rollouts(task):
+    """
+        Plays n_episodes greedy games with the policy from the checkpoint, returns per-game arrays.
+    """
+    checkpoint_dir, (striga_class, striga_params), seed, n_episodes = task
+    random.seed(seed)
+
+    meta = read_checkpoint(checkpoint_dir)
+    geometry = meta['geometry']
+    config = GameParameters(**meta['config'])
+    game_map = GameMap(geometry['width'], geometry['height'], geometry['tlareg_start'], geometry['striga_start'],
+                       geometry['walls'], geometry['castle'])
+    striga = striga_class(game_map, **striga_params)
+    tlareg = TlaregQLearning(game_map, striga, config)
+    tlareg.load_checkpoint(checkpoint_dir)
+
+    won = np.empty(n_episodes, dtype=bool)
+    turns = np.empty(n_episodes, dtype=np.int32)
+    hits = np.empty(n_episodes, dtype=np.int16)
+    for i in range(n_episodes):
+        game_map.reset(tlareg.tlareg_start, tlareg.striga_start)
+        striga.reset()
+        game = HeadlessGame(game_map, tlareg, striga, config)
+        won[i] = game.play()
+        turns[i] = game.turns
+        hits[i] = config.striga_lives - game.striga_lives
+    return won, turns, hits
+
+
+def checkpoint_striga(checkpoint_dir):
+    """
+        The (Striga class, constructor parameters) pair the checkpoint was trained against.
+    """
+    meta = read_checkpoint(checkpoint_dir)
+    if 'striga' not in meta:
+        raise ValueError('The checkpoint does not record its Striga, pass it to evaluate')
+    striga_class = STRIGAS[meta['striga']['class']]
+    return striga_class, striga_class.parse_parameters(meta['striga']['parameters'])
+
+
+def evaluate(checkpoint_dir, n_episodes, striga=None, processes=None, seed=1234, n_chunks=None):
+    """
+        Evaluates the greedy policy saved by Tlareg.save_checkpoint with n_episodes Monte Carlo rollouts played by
+        the rules of Game.simulate_turn, split into n_chunks tasks on a process pool. The Q table is memory-mapped by
+        every worker, so it is not copied between the processes.
+        striga is a (Striga class, constructor parameters) pair, by default the Striga of the training.
+        survival_turns counts the turns before the last one of every game, like Tlareg.tlareg_life_time_data.
+    """
+    striga = striga if striga is not None else checkpoint_striga(checkpoint_dir)
+    processes = processes if processes is not None else os.cpu_count()
+    n_chunks = n_chunks if n_chunks is not None else 4 * processes
+    chunks = [len(chunk) for chunk in np.array_split(np.arange(n_episodes), n_chunks) if len(chunk) > 0]
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(chunks))]
+    tasks = [(checkpoint_dir, striga, chunk_seed, chunk) for chunk_seed, chunk in zip(seeds, chunks)]
+    with Pool(processes) as pool:
+        results = pool.map(run_rollouts, tasks)
+
+    won, turns, hits = (np.concatenate(arrays) for arrays in zip(*results))
+    return EvaluationResult(n_episodes, Estimate.from_samples(won), Estimate.from_samples(turns),
+                            Estimate.from_samples(hits))
+
+
+if __name__ == '__main__':
+    start_time = time.time()
+    result = evaluate('checkpoint', 100_000)
+    print(f'episodes: {result.n_episodes} ({time.time() - start_time:.1f} s)')
+    print(f'win rate: {result.win_rate}')
+    print(f'survival turns: {result.survival_turns}')
+    print(f'hits: {result.hits}')
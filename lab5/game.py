@@ -82,3 +82,30 @@ class Game:
         except Exception as e:
             print(e)
             print(e.with_traceback())
+
+
+class HeadlessGame(Game):
+    """
+        Game without the animation: the same turns as in Game.simulate_turn, played until one of the characters dies.
+        turns counts the turns survived before the last one, like Tlareg.tlareg_life_time_data.
+    """
+
+    def __init__(self, game_map: GameMap, tlareg: Tlareg, striga: Striga, config: GameParameters):
+        super().__init__(game_map, tlareg, striga, config)
+        self.tlareg_won = None
+        self.turns = 0
+
+    def kill_tlareg(self, message='Striga killed Tlareg'):
+        if self.tlareg_won is None:
+            self.tlareg_won = False
+
+    def kill_striga(self, message='Tlareg killed Striga'):
+        if self.tlareg_won is None:
+            self.tlareg_won = True
+
+    def play(self):
+        while True:
+            self.simulate_turn()
+            if self.tlareg_won is not None:
+                return self.tlareg_won
+            self.turns += 1
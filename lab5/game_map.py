@@ -1,11 +1,14 @@
 import random
 
-import matplotlib.pyplot as plt
+import numpy as np
 from matplotlib import colors
 
 from exceptions import TlaregHitStriga, StrigaHitTlareg
 from utils import Position, Direction, State
 
+DIRECTIONS = list(Direction)
+DIRECTION_INDEX = {direction: i for i, direction in enumerate(DIRECTIONS)}
+
 
 class GameMap:
     colormap = colors.ListedColormap(['black', 'grey', 'green', 'red', 'lime', 'lightcoral'])
@@ -21,23 +24,91 @@ class GameMap:
         self.castle = Position(castle[0], castle[1])
         self.striga_momentum = striga_momentum
 
-        self.tlareg_attacked_positions = []
-        self.striga_attacked_positions = []
+        self.tlareg_attacked_cells = []
+        self.striga_attacked_cells = []
 
         self.tlareg_frequency = [[0 for _ in range(self.height)] for _ in range(self.width)]
         self.tlareg_frequency[self.tlareg.y][self.tlareg.x] = 1
 
+        self.init_tables()
+
+    def init_tables(self):
+        """
+            Precomputes everything that depends only on the map as arrays indexed by cell (see cell_index), so that a
+            turn is a few array lookups. -1 marks a missing cell:
+                positions[cell] - Position of the cell,
+                valid_cells[cell] - the cell is inside the map and is not a wall,
+                neighbors[cell, direction] - cell reached by moving in DIRECTIONS[direction],
+                tlareg_footprints[cell] - cells attacked by Tlareg standing at cell,
+                striga_footprints[momentum, cell] - cells attacked by Striga with the momentum DIRECTIONS[momentum],
+                tlareg_hits[cell, target], striga_hits[momentum, cell, target] - target is in the footprint,
+                castle_exits - cells where Striga can leave the castle.
+        """
+        cells = np.arange(self.n_cells)
+        cell_x, cell_y = cells % self.width, cells // self.width
+        self.positions = [Position(x, y) for x, y in zip(cell_x.tolist(), cell_y.tolist())]
+
+        self.valid_cells = np.ones(self.n_cells, dtype=bool)
+        self.valid_cells[[self.cell_index(wall) for wall in self.walls if wall.is_in_map(self)]] = False
+
+        def cells_at(x, y):
+            # cells of the coordinates, -1 outside the map and on the walls
+            inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+            cell = np.where(inside, y * self.width + x, 0)
+            return np.where(inside & self.valid_cells[cell], cell, -1)
+
+        self.neighbors = np.stack([cells_at(cell_x + dx, cell_y + dy) for dx, dy in (d.value for d in DIRECTIONS)],
+                                  axis=1)
+
+        offsets = [(i, j) for i in [-1, 0, 1] for j in [-1, 0, 1] if (i, j) != (0, 0)]
+        self.tlareg_footprints = np.stack([cells_at(cell_x + i, cell_y + j) for i, j in offsets], axis=1)
+
+        self.striga_footprints = np.empty((len(DIRECTIONS), self.n_cells, 3), dtype=int)
+        for momentum, (dx, dy) in enumerate(d.value for d in DIRECTIONS):
+            if dx == 0:
+                footprint = [cells_at(cell_x + i, cell_y + dy) for i in [-1, 0, 1]]
+            else:
+                footprint = [cells_at(cell_x + dx, cell_y + i) for i in [-1, 0, 1]]
+            self.striga_footprints[momentum] = np.stack(footprint, axis=1)
+
+        self.tlareg_hits = np.zeros((self.n_cells, self.n_cells), dtype=bool)
+        cell, i = np.nonzero(self.tlareg_footprints >= 0)
+        self.tlareg_hits[cell, self.tlareg_footprints[cell, i]] = True
+        self.striga_hits = np.zeros((len(DIRECTIONS), self.n_cells, self.n_cells), dtype=bool)
+        momentum, cell, i = np.nonzero(self.striga_footprints >= 0)
+        self.striga_hits[momentum, cell, self.striga_footprints[momentum, cell, i]] = True
+
+        exits = [(self.width - 4, self.height - i) for i in [1, 2, 3, 4]]
+        exits += [(self.width - i, self.height - 4) for i in [3, 2, 1]]
+        exit_cells = cells_at(*np.array(exits).T)
+        self.castle_exits = exit_cells[exit_cells >= 0]
+
+        self.valid_positions = [Position(x, y) for x in range(self.width) for y in range(self.height)
+                                if self.valid_cells[y * self.width + x]]
+
     @property
     def state(self):
         return State(self.tlareg, self.striga)
 
+    @property
+    def n_cells(self):
+        return self.width * self.height
+
+    def cell_index(self, position: Position):
+        return position.y * self.width + position.x
+
+    def get_geometry(self):
+        return {'width': self.width, 'height': self.height,
+                'walls': sorted([wall.x, wall.y] for wall in self.walls),
+                'castle': [self.castle.x, self.castle.y]}
+
     def reset(self, tlareg: tuple[int, int], striga: tuple[int, int], striga_momentum: Direction = Direction.UP):
         self.tlareg = Position(tlareg[0], tlareg[1])
         self.striga = Position(striga[0], striga[1])
         self.striga_momentum = striga_momentum
 
-        self.tlareg_attacked_positions = []
-        self.striga_attacked_positions = []
+        self.tlareg_attacked_cells = []
+        self.striga_attacked_cells = []
 
     def get_imshow_data(self):
         data = [[0 for _ in range(self.height)] for _ in range(self.width)]
@@ -50,12 +121,14 @@ class GameMap:
         if self.striga is not None:
             data[self.striga.y][self.striga.x] = 3
 
-        for position in self.tlareg_attacked_positions:
-            data[position.y][position.x] = 4
-        self.tlareg_attacked_positions = []
-        for position in self.striga_attacked_positions:
-            data[position.y][position.x] = 5
-        self.striga_attacked_positions = []
+        for cell in self.tlareg_attacked_cells:
+            if cell >= 0:
+                data[self.positions[cell].y][self.positions[cell].x] = 4
+        self.tlareg_attacked_cells = []
+        for cell in self.striga_attacked_cells:
+            if cell >= 0:
+                data[self.positions[cell].y][self.positions[cell].x] = 5
+        self.striga_attacked_cells = []
 
         return data
 
@@ -63,24 +136,11 @@ class GameMap:
         self.tlareg_frequency = [[0 for _ in range(self.height)] for _ in range(self.width)]
         self.tlareg_frequency[self.tlareg.y][self.tlareg.x] = 1
 
-    def save_traleg_frequency(self, title, directory='./plots/frequency'):
-        fig = plt.figure()
-        im = plt.imshow(self.tlareg_frequency, cmap='Greens')
-        fig.gca().invert_yaxis()
-        plt.title(title)
-        plt.savefig(directory + f'/{title}.jpg')
-        plt.close(fig)
-
     def get_possible_moves(self, position: Position):
-        moves = set()
-        for direction in Direction:
-            new_position = position + direction
-            if new_position.is_valid(self):
-                moves.add(direction)
-        return moves
+        return {DIRECTIONS[direction] for direction in np.flatnonzero(self.neighbors[self.cell_index(position)] >= 0)}
 
     def get_valid_positions(self):
-        return [Position(x, y) for x in range(self.width) for y in range(self.height) if Position(x, y).is_valid(self)]
+        return list(self.valid_positions)
 
     def move_tlareg(self, direction: Direction):
         """
@@ -104,27 +164,19 @@ class GameMap:
         self.striga = self.castle
 
     def striga_leave_castle(self):
-        positions = [Position(self.width - 4, self.height - i) for i in [1, 2, 3, 4]]
-        positions += [Position(self.width - i, self.height - 4) for i in [3, 2, 1]]
-        position = random.choice(positions)
-        while not position.is_valid(self) or position == self.tlareg:
-            position = random.choice(positions)
-        self.striga = position
+        tlareg_cell = self.cell_index(self.tlareg)
+        exits = [cell for cell in self.castle_exits.tolist() if cell != tlareg_cell]
+        self.striga = self.positions[random.choice(exits)]
 
     def tlareg_attack(self):
-        attacked_positions = [self.tlareg + Position(i, j) for i in [-1, 0, 1] for j in [-1, 0, 1]]
-        attacked_positions.remove(self.tlareg)
-        self.tlareg_attacked_positions = list(filter(lambda pos: pos.is_valid(self), attacked_positions))
-        if self.striga in self.tlareg_attacked_positions:
+        tlareg_cell = self.cell_index(self.tlareg)
+        self.tlareg_attacked_cells = self.tlareg_footprints[tlareg_cell]
+        if self.tlareg_hits[tlareg_cell, self.cell_index(self.striga)]:
             raise TlaregHitStriga
 
     def striga_attack(self):
-        attacked_positions = []
-        if self.striga_momentum.value[0] == 0:
-            attacked_positions += [self.striga + Position(i, self.striga_momentum.value[1]) for i in [-1, 0, 1]]
-        else:
-            attacked_positions += [self.striga + Position(self.striga_momentum.value[0], i) for i in [-1, 0, 1]]
-        self.striga_attacked_positions = list(filter(lambda pos: pos.is_valid(self), attacked_positions))
-        if self.tlareg in attacked_positions:
+        momentum, striga_cell = DIRECTION_INDEX[self.striga_momentum], self.cell_index(self.striga)
+        self.striga_attacked_cells = self.striga_footprints[momentum, striga_cell]
+        if self.striga_hits[momentum, striga_cell, self.cell_index(self.tlareg)]:
             self.tlareg = None
             raise StrigaHitTlareg
@@ -1,5 +1,7 @@
+import os
+
 from game import Game
-from game_map import GameMap
+from maps import default_game_map
 import time
 
 from striga import StrigaDeterministic, StrigaStochastic
@@ -16,14 +18,7 @@ height = 8
 tlareg_start = (1, 1)
 striga_start = (4, 5)
 
-# walls and castle walls
-walls = [(3, 1), (3, 2), (3, 3), (3, 5), (2, 5)]
-walls += [(width - i, height - j) for j in [1, 2, 3] for i in [1, 2, 3]]
-walls.remove((width - 2, height - 2))
-
-castle = (width - 2, height - 2)
-
-game_map = GameMap(width, height, tlareg_start, striga_start, walls, castle)
+game_map = default_game_map(width, height, tlareg_start, striga_start)
 
 # Striga and Tlareg models
 
@@ -36,17 +31,29 @@ tlareg = TlaregQLearning(game_map, striga, config)
 n_games = 5000
 report_step = n_games // 10
 
-tlareg.init_Q()
+checkpoint_dir = 'checkpoint'
+
+if os.path.exists(os.path.join(checkpoint_dir, 'checkpoint.json')):
+    # Start from the trained policy (delete the checkpoint directory to learn from scratch), resume the learning first
+    # if it was interrupted
+    tlareg.load_checkpoint(checkpoint_dir, mmap_mode='c')
+    if tlareg.games_played < tlareg.learn_parameters['n_games']:
+        tlareg.resume(report_step=report_step, checkpoint_dir=checkpoint_dir)
+else:
+    tlareg.init_Q()
+
+    start_time = time.time()
+    # tlareg.learn(n_games=n_games, alpha=0.9, gamma=0.9, start_eps=0.99, end_eps=0.01, report_step=report_step)
+    tlareg.learn(n_games=n_games, alpha=0.1, gamma=0.1, start_eps=0.9, end_eps=0.01, report_step=report_step,
+                 checkpoint_dir=checkpoint_dir)
 
-start_time = time.time()
-# tlareg.learn(n_games=n_games, alpha=0.9, gamma=0.9, start_eps=0.99, end_eps=0.01, report_step=report_step)
-tlareg.learn(n_games=n_games, alpha=0.1, gamma=0.1, start_eps=0.9, end_eps=0.01, report_step=report_step)
+    # tlareg.learn(n_games=n_games, alpha=0.8, gamma=0.9, start_eps=0.99, end_eps=0.01, report_step=report_step)
 
-# tlareg.learn(n_games=n_games, alpha=0.8, gamma=0.9, start_eps=0.99, end_eps=0.01, report_step=report_step)
+    end_time = time.time()
+    elapsed = end_time - start_time
+    print(f'-----{elapsed:5.1f} s')
 
-end_time = time.time()
-elapsed = end_time - start_time
-print(f'-----{elapsed:5.1f} s')
+# Plots of the training metrics: python plot_metrics.py
 
 # Animation
 
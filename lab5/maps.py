@@ -0,0 +1,15 @@
+from game_map import GameMap
+
+
+def default_game_map(width=8, height=8, tlareg_start=(1, 1), striga_start=(4, 5)):
+    """
+        The map used in the report: a few walls in the middle and Striga's castle in the top right corner.
+    """
+    # walls and castle walls
+    walls = [(3, 1), (3, 2), (3, 3), (3, 5), (2, 5)]
+    walls += [(width - i, height - j) for j in [1, 2, 3] for i in [1, 2, 3]]
+    walls.remove((width - 2, height - 2))
+
+    castle = (width - 2, height - 2)
+
+    return GameMap(width, height, tlareg_start, striga_start, walls, castle)
@@ -0,0 +1,78 @@
+import glob
+import os
+import queue
+import threading
+
+import numpy as np
+
+
+class MetricsWriter:
+    """
+        Saves training metrics as .npz chunks in a background thread, so the training loop only has to copy them.
+        The plots are rendered from the chunks after the run by plot_metrics.py. An error of the writer thread is
+        raised again by the next save or by close().
+    """
+
+    def __init__(self, directory='./metrics', clear=True):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        if clear:
+            for path in glob.glob(os.path.join(directory, '*.npz')):
+                os.remove(path)
+
+        self.queue = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            name, arrays = item
+            try:
+                np.savez(os.path.join(self.directory, name), **arrays)
+            except Exception as e:
+                # stop writing, the following chunks are dropped and the error is reported to the training loop
+                self.error = e
+                return
+
+    def check_error(self):
+        if self.error is not None:
+            raise RuntimeError('Saving the metrics failed') from self.error
+
+    def save_frequency(self, it, frequency):
+        self.check_error()
+        self.queue.put((f'frequency_{it:06d}', {'it': it, 'frequency': np.array(frequency, dtype=np.int32)}))
+
+    def save_games(self, start, rewards, life_time, hits):
+        """
+            Per-game statistics of games start, start + 1, ...
+        """
+        self.check_error()
+        self.queue.put((f'games_{start:06d}', {'start': start,
+                                               'rewards': np.array(rewards, dtype=float),
+                                               'life_time': np.array(life_time, dtype=np.int32),
+                                               'hits': np.array(hits, dtype=np.int32)}))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.check_error()
+
+
+def load_games(directory='./metrics'):
+    """
+        Concatenates all the per-game chunks, returns (rewards, life_time, hits).
+    """
+    chunks = [np.load(path) for path in sorted(glob.glob(os.path.join(directory, 'games_*.npz')))]
+    return tuple(np.concatenate([chunk[key] for chunk in chunks]) for key in ['rewards', 'life_time', 'hits'])
+
+
+def load_frequencies(directory='./metrics'):
+    """
+        Returns a list of (iteration, frequency grid) pairs.
+    """
+    chunks = [np.load(path) for path in sorted(glob.glob(os.path.join(directory, 'frequency_*.npz')))]
+    return [(int(chunk['it']), chunk['frequency']) for chunk in chunks]
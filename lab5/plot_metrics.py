@@ -0,0 +1,62 @@
+import argparse
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+from scipy.signal import lfilter
+
+from metrics import load_frequencies, load_games
+
+
+def exponential_average(data, alpha):
+    """
+        weighted_sums[0] = data[0], weighted_sums[i] = alpha * data[i] + (1 - alpha) * weighted_sums[i - 1]
+    """
+    data = np.asarray(data, dtype=float)
+    weighted_sums, _ = lfilter([alpha], [1, alpha - 1], data, zi=[(1 - alpha) * data[0]])
+    return weighted_sums
+
+
+def plot_single(data, title, ylabel, directory, alpha=0.005):
+    x_data = np.arange(len(data))
+    plt.plot(x_data, exponential_average(data, alpha), label=f'exponential, alpha = {alpha}')
+
+    plt.plot(x_data, np.cumsum(data) / np.arange(1, len(data) + 1), label='cumulative')
+    plt.title(f'{title}')
+    plt.xlabel('iterations')
+    plt.ylabel(f'{ylabel}')
+    plt.gca().yaxis.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(os.path.join(directory, f'{title.replace(" ", "_").lower()}.jpg'))
+    plt.close()
+
+
+def plot_frequency(frequency, title, directory):
+    fig = plt.figure()
+    plt.imshow(frequency, cmap='Greens')
+    fig.gca().invert_yaxis()
+    plt.title(title)
+    plt.savefig(os.path.join(directory, f'{title}.jpg'))
+    plt.close(fig)
+
+
+def plot_metrics(metrics_dir='./metrics', plots_dir='./plots'):
+    os.makedirs(os.path.join(plots_dir, 'frequency'), exist_ok=True)
+
+    rewards, life_time, hits = load_games(metrics_dir)
+    plot_single(rewards, 'Rewards', 'sum of the rewards', plots_dir)
+    plot_single(life_time, 'Life time', 'survived turns', plots_dir)
+    plot_single(hits, 'Hits before death', 'hits', plots_dir)
+
+    for it, frequency in load_frequencies(metrics_dir):
+        plot_frequency(frequency, f'it = {it}', os.path.join(plots_dir, 'frequency'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Renders the plots of a training run saved by MetricsWriter.')
+    parser.add_argument('metrics_dir', nargs='?', default='./metrics')
+    parser.add_argument('plots_dir', nargs='?', default='./plots')
+    args = parser.parse_args()
+
+    plot_metrics(args.metrics_dir, args.plots_dir)
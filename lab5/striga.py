@@ -1,6 +1,6 @@
 import random
 
-from game_map import GameMap
+from game_map import DIRECTION_INDEX, GameMap
 from utils import Direction, Action, Position
 
 
@@ -21,6 +21,19 @@ class Striga:
     def leave_castle(self):
         raise NotImplementedError
 
+    def get_parameters(self):
+        """
+            Constructor parameters (besides game_map) as JSON-compatible values, see parse_parameters.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def parse_parameters(parameters):
+        """
+            Constructor parameters from the values returned by get_parameters.
+        """
+        return dict(parameters)
+
 
 class StrigaDeterministic(Striga):
     """
@@ -46,6 +59,9 @@ class StrigaDeterministic(Striga):
     def reset(self):
         self.idx = self.start_idx
 
+    def get_parameters(self):
+        return {'start_idx': self.start_idx}
+
     def move(self):
         action = self.actions[self.idx]
         if action == Action.ATTACK:
@@ -85,23 +101,34 @@ class StrigaStochastic(Striga):
     def reset(self):
         self.prev_direction = self.start_prev_direction
 
+    def get_parameters(self):
+        return {'attack_probability': self.attack_probability, 'prev_direction': self.start_prev_direction.name}
+
+    @staticmethod
+    def parse_parameters(parameters):
+        return {**parameters, 'prev_direction': Direction[parameters['prev_direction']]}
+
     def move(self):
         if random.uniform(0, 1) < self.attack_probability:  # attack
             self.game_map.striga_attack()
         else:  # move
             directions = [self.prev_direction, Direction.get_random()]
             direction = random.choice(directions)
-            new_pos = self.game_map.striga + direction
+            striga_cell = self.game_map.cell_index(self.game_map.striga)
+            new_cell = self.game_map.neighbors[striga_cell, DIRECTION_INDEX[direction]]
 
             # Reverse the direction if encountered a wall or end of the map
-            if not new_pos.is_valid(self.game_map):
+            if new_cell < 0:
                 direction = direction.get_opposite()
-                new_pos = self.game_map.striga + direction
+                new_cell = self.game_map.neighbors[striga_cell, DIRECTION_INDEX[direction]]
 
             # Move if the new position is valid and Tlareg is not there
-            if new_pos.is_valid(self.game_map) and new_pos != self.game_map.tlareg:
+            if new_cell >= 0 and self.game_map.positions[new_cell] != self.game_map.tlareg:
                 self.game_map.move_striga(direction)
                 self.prev_direction = direction
 
     def leave_castle(self):
         self.game_map.striga_leave_castle()
+
+
+STRIGAS = {cls.__name__: cls for cls in [StrigaDeterministic, StrigaStochastic]}
@@ -0,0 +1,89 @@
+import itertools
+import random
+import time
+from dataclasses import asdict
+from multiprocessing import Pool
+
+import numpy as np
+
+from maps import default_game_map
+from striga import StrigaDeterministic, StrigaStochastic
+from tlareg import TlaregSarsa, TlaregQLearning
+from utils import GameParameters
+
+
+def run_task(task):
+    """
+        Trains a single Tlareg on its own GameMap and returns compact per-game arrays.
+    """
+    idx, seed, map_params, learn_params, config, (striga_class, striga_params), tlareg_class = task
+    random.seed(seed)
+    np.random.seed(seed)
+
+    game_map = default_game_map(**map_params)
+    striga = striga_class(game_map, **striga_params)
+    tlareg = tlareg_class(game_map, striga, config)
+    tlareg.init_Q()
+    tlareg.learn(**learn_params, report_step=None, metrics_dir=None)
+
+    return (idx,
+            np.asarray(tlareg.rewards_data, dtype=np.float64),
+            np.asarray(tlareg.tlareg_life_time_data, dtype=np.int32),
+            np.asarray(tlareg.hits_before_death_data, dtype=np.int16))
+
+
+def sweep(learn_grid, config_grid, striga_grid, tlareg_grid, output_file, map_params=None, seed=1234,
+          processes=None):
+    """
+        Trains one Tlareg for every combination of:
+            learn_grid - dicts of Tlareg.learn parameters (n_games must be the same in all of them),
+            config_grid - GameParameters,
+            striga_grid - (Striga class, constructor parameters) pairs,
+            tlareg_grid - Tlareg classes,
+        on a process pool. Every task gets its own seed derived from seed, so the results do not depend on the
+        number of processes. The per-game rewards, life times and hits of all tasks are saved to a single .npz file,
+        row i of every array belongs to task i.
+    """
+    n_games = {learn_params['n_games'] for learn_params in learn_grid}
+    if len(n_games) != 1:
+        raise ValueError(f'All learn_grid parameters must have the same n_games, got {sorted(n_games)}')
+    n_games, = n_games
+
+    map_params = map_params if map_params is not None else {}
+    combinations = list(itertools.product(learn_grid, config_grid, striga_grid, tlareg_grid))
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(combinations))]
+    tasks = [(i, seeds[i], map_params) + combination for i, combination in enumerate(combinations)]
+
+    rewards = np.empty((len(tasks), n_games), dtype=np.float64)
+    life_time = np.empty((len(tasks), n_games), dtype=np.int32)
+    hits = np.empty((len(tasks), n_games), dtype=np.int16)
+
+    start_time = time.time()
+    with Pool(processes) as pool:
+        results = pool.imap_unordered(run_task, tasks)
+        for n_done, (idx, task_rewards, task_life_time, task_hits) in enumerate(results, 1):
+            rewards[idx], life_time[idx], hits[idx] = task_rewards, task_life_time, task_hits
+            print(f'{n_done:4}/{len(tasks)} ({time.time() - start_time:5.1f} s)')
+
+    parameters = {}
+    for key in learn_grid[0]:
+        parameters[key] = np.array([learn_params[key] for learn_params, _, _, _ in combinations])
+    for key in asdict(config_grid[0]):
+        parameters[key] = np.array([getattr(config, key) for _, config, _, _ in combinations])
+    parameters['striga'] = np.array([f'{cls.__name__}{params}' for _, _, (cls, params), _ in combinations])
+    parameters['tlareg'] = np.array([cls.__name__ for _, _, _, cls in combinations])
+
+    np.savez_compressed(output_file, rewards=rewards, life_time=life_time, hits=hits, seed=np.array(seeds),
+                        **parameters)
+
+
+if __name__ == '__main__':
+    n_games = 5000
+
+    learn_grid = [dict(n_games=n_games, alpha=alpha, gamma=gamma, start_eps=start_eps, end_eps=0.01)
+                  for alpha in [0.1, 0.5, 0.9] for gamma in [0.1, 0.5, 0.9] for start_eps in [0.9, 0.99]]
+    config_grid = [GameParameters(striga_lives=5, tlareg_counter_start=1000, striga_castle_time=5)]
+    striga_grid = [(StrigaDeterministic, {}), (StrigaStochastic, {'attack_probability': 0.3})]
+    tlareg_grid = [TlaregSarsa, TlaregQLearning]
+
+    sweep(learn_grid, config_grid, striga_grid, tlareg_grid, 'sweep.npz')
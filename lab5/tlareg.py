@@ -1,14 +1,31 @@
+import glob
+import json
+import os
 import random
+from dataclasses import asdict
 
-import matplotlib.pyplot as plt
 import numpy as np
 import time
 
 from exceptions import StrigaHitTlareg, TlaregHitStriga
-from game_map import GameMap
-from striga import Striga
+from game_map import DIRECTION_INDEX, DIRECTIONS, GameMap
+from metrics import MetricsWriter
+from striga import Striga, StrigaStochastic
 from utils import Action, GameParameters, State
 
+ACTIONS = list(Action)
+# DIRECTIONS index of the move of every action but ATTACK, and of the opposite of every direction
+ACTION_DIRECTIONS = [DIRECTION_INDEX[action.to_direction()] for action in ACTIONS if action != Action.ATTACK]
+OPPOSITE_DIRECTIONS = [DIRECTION_INDEX[direction.get_opposite()] for direction in DIRECTIONS]
+
+
+def read_checkpoint(directory):
+    """
+        Returns the metadata of a checkpoint saved by Tlareg.save_checkpoint.
+    """
+    with open(os.path.join(directory, 'checkpoint.json')) as file:
+        return json.load(file)
+
 
 class Tlareg:
     TLAREG_DEAD_REWARD = -1000_000
@@ -38,13 +55,23 @@ class Tlareg:
         self.striga_castle_counter = 0
 
         self.Q = None
+        self.Q_rows = None
+        self.valid_actions = None
+        self.possible_actions = None
+        self.map_tables = None
+
+        self.learn_parameters = None
+        self.games_played = 0
 
-        self.x_data = None
         self.rewards_data = None
         self.tlareg_life_time_data = None
         self.hits_before_death_data = None
 
-    def choose_action(self, state, eps):
+    def choose_action(self, values, tlareg_cell, eps):
+        """
+            Returns the index of the action to take in a state with the Q values (a list, one per action) when Tlareg
+            stands at tlareg_cell.
+        """
         raise NotImplementedError('Use a child class instead!')
 
     def reset_parameters(self):
@@ -55,52 +82,168 @@ class Tlareg:
         self.striga_lives = self.config.striga_lives
 
     def init_Q(self):
-        self.Q = dict()
+        """
+            Q is a dense array indexed by (Tlareg cell, Striga cell, action index). Actions that are not possible in
+            a given Tlareg cell are set to -inf, so they are never selected as the best action.
+        """
+        self.init_actions()
+        n_cells = self.game_map.n_cells
+        Q = np.zeros((n_cells, n_cells, len(Action)))
+        Q[np.broadcast_to(~self.valid_actions[:, np.newaxis, :], Q.shape)] = -np.inf
+        self.set_Q(Q)
+        self.games_played = 0
+
+    def set_Q(self, Q):
+        # Q_rows is a view of Q with one row per state, see state_row
+        self.Q = Q
+        self.Q_rows = Q.reshape(-1, len(Action))
+
+    def init_actions(self):
+        n_cells = self.game_map.n_cells
+        self.valid_actions = np.zeros((n_cells, len(Action)), dtype=bool)
         for tlareg_pos in self.game_map.get_valid_positions():
-            for striga_pos in self.game_map.get_valid_positions():
-                if tlareg_pos == striga_pos:
-                    continue
+            cell = self.game_map.cell_index(tlareg_pos)
+            for direction in self.game_map.get_possible_moves(tlareg_pos):
+                self.valid_actions[cell, Action.from_direction(direction).index] = True
+            self.valid_actions[cell, Action.ATTACK.index] = True
+        self.possible_actions = [np.flatnonzero(cell_actions).tolist() for cell_actions in self.valid_actions]
+
+        # the map tables used every turn of stochastic_learning_episode, as plain lists
+        cells = np.arange(n_cells)
+        cell_x, cell_y = cells % self.game_map.width, cells // self.game_map.width
+        distances = np.abs(cell_x[:, np.newaxis] - cell_x) + np.abs(cell_y[:, np.newaxis] - cell_y)
+        self.map_tables = (self.game_map.neighbors.tolist(), self.game_map.tlareg_hits.tolist(),
+                           self.game_map.striga_hits.tolist(), self.game_map.castle_exits.tolist(),
+                           distances.tolist(), cell_x.tolist(), cell_y.tolist())
+
+    def state_row(self, tlareg_cell, striga_cell):
+        return tlareg_cell * self.game_map.n_cells + striga_cell
+
+    def get_geometry(self):
+        return {'tlareg_start': list(self.tlareg_start), 'striga_start': list(self.striga_start),
+                **self.game_map.get_geometry()}
+
+    def save_checkpoint(self, directory):
+        """
+            Saves the Q table (Q_<games played>.npy) and everything needed to resume the learning (checkpoint.json,
+            which names the Q file) to the directory.
+
+            The new Q file never overwrites the one of the previous checkpoint, and replacing checkpoint.json is the
+            only step that switches to the new checkpoint. An interrupted save leaves the previous checkpoint whole.
+        """
+        os.makedirs(directory, exist_ok=True)
+        Q_name = f'Q_{self.games_played:09d}.npy'
+        meta = {'tlareg': type(self).__name__,
+                'geometry': self.get_geometry(),
+                'config': asdict(self.config),
+                'striga': {'class': type(self.striga).__name__, 'parameters': self.striga.get_parameters()},
+                'learn_parameters': self.learn_parameters,
+                'games_played': self.games_played,
+                'Q': Q_name}
+
+        with open(os.path.join(directory, Q_name + '.tmp'), 'wb') as file:
+            np.save(file, self.Q)
+        os.replace(os.path.join(directory, Q_name + '.tmp'), os.path.join(directory, Q_name))
+        with open(os.path.join(directory, 'checkpoint.json.tmp'), 'w') as file:
+            json.dump(meta, file, indent=4)
+        os.replace(os.path.join(directory, 'checkpoint.json.tmp'), os.path.join(directory, 'checkpoint.json'))
+
+        # Q tables of the previous checkpoints
+        for path in glob.glob(os.path.join(directory, 'Q_*.npy')):
+            if os.path.basename(path) != Q_name:
+                os.remove(path)
+
+    def load_checkpoint(self, directory, mmap_mode='r'):
+        """
+            Loads a checkpoint saved by save_checkpoint. With the default mmap_mode='r' the Q table is memory-mapped
+            read-only, which is enough for move(). Use mmap_mode='c' (copy-on-write) or None to resume the learning.
+        """
+        meta = read_checkpoint(directory)
+        if meta['geometry'] != self.get_geometry():
+            raise ValueError('The checkpoint was saved for a different map')
+        if meta['config'] != asdict(self.config):
+            raise ValueError('The checkpoint was saved with different game parameters')
+
+        self.init_actions()
+        self.set_Q(np.load(os.path.join(directory, meta['Q']), mmap_mode=mmap_mode))
+        self.learn_parameters = meta['learn_parameters']
+        self.games_played = meta['games_played']
+
+    def resume(self, report_step=500, metrics_dir='./metrics', checkpoint_dir=None):
+        """
+            Continues the interrupted learn() call, with the same parameters and eps schedule.
+        """
+        self.learn(**self.learn_parameters, report_step=report_step, metrics_dir=metrics_dir,
+                   checkpoint_dir=checkpoint_dir, start_game=self.games_played)
+
+    def learn(self, n_games=5000, alpha=0.8, gamma=0.6, start_eps=0.8, end_eps=0.1, report_step=500,
+              metrics_dir='./metrics', checkpoint_dir=None, start_game=0):
+        """
+            report_step=None disables progress reports. The frequency maps and per-game statistics are saved to
+            metrics_dir in the background (None disables it), plot them with plot_metrics.py after the run.
+            If checkpoint_dir is given, a checkpoint is saved there every report_step games and at the end.
+            start_game > 0 continues the learning after start_game games, use resume() instead.
+        """
+        metrics = MetricsWriter(metrics_dir, clear=start_game == 0) if metrics_dir is not None else None
+        metrics_start = start_game
 
-                state = State(tlareg_pos, striga_pos)
-                actions = list(map(lambda d: Action.from_direction(d), self.game_map.get_possible_moves(tlareg_pos)))
-                actions += [Action.ATTACK]
-
-                self.Q[state] = dict()
-                for action in actions:
-                    self.Q[state][action] = 0
-
-    def learn(self, n_games=5000, alpha=0.8, gamma=0.6, start_eps=0.8, end_eps=0.1, report_step=500):
-        self.x_data = np.arange(n_games)
         self.rewards_data = [0] * n_games
         self.tlareg_life_time_data = [0] * n_games
         self.hits_before_death_data = [0] * n_games
 
+        self.learn_parameters = {'n_games': n_games, 'alpha': alpha, 'gamma': gamma,
+                                 'start_eps': start_eps, 'end_eps': end_eps}
         self.alpha = alpha
         self.gamma = gamma
-        eps = start_eps
         eps_step = (start_eps - end_eps) / (n_games - 1)
-        start_time = time.time()
-        for i in range(1, n_games + 1):
-            self.learning_episode(eps, i - 1)
 
-            if i in [1, 5, 10, 50, 100]:
-                self.game_map.save_traleg_frequency(f'it = {i}')
-
-            if i % report_step == 0:
-                end_time = time.time()
-                elapsed = end_time - start_time
-                start_time = end_time
-                print(f'{i:5} ({elapsed:2.1f} s): eps: {eps:0.2f}')
-                self.game_map.save_traleg_frequency(f'it = {i}')
-
-            eps -= eps_step
-            self.reset_parameters()
-
-        self.plot_data()
+        # against StrigaStochastic the episodes are played by stochastic_learning_episode on Q as nested lists, copied
+        # back to Q for the checkpoints and at the end
+        Q_lists = self.Q_rows.tolist() if type(self.striga) is StrigaStochastic else None
+        start_time = time.time()
+        try:
+            for i in range(start_game + 1, n_games + 1):
+                eps = start_eps - (i - 1) * eps_step
+                if Q_lists is not None:
+                    self.stochastic_learning_episode(eps, i - 1, Q_lists)
+                else:
+                    self.learning_episode(eps, i - 1)
+                self.games_played = i
+
+                reported = report_step is not None and i % report_step == 0
+                if reported:
+                    end_time = time.time()
+                    elapsed = end_time - start_time
+                    start_time = end_time
+                    print(f'{i:5} ({elapsed:2.1f} s): eps: {eps:0.2f}')
+
+                if metrics is not None:
+                    if reported or i in [1, 5, 10, 50, 100]:
+                        metrics.save_frequency(i, self.game_map.tlareg_frequency)
+                    if reported or i == n_games:
+                        metrics.save_games(metrics_start, self.rewards_data[metrics_start:i],
+                                           self.tlareg_life_time_data[metrics_start:i],
+                                           self.hits_before_death_data[metrics_start:i])
+                        metrics_start = i
+
+                if checkpoint_dir is not None and (reported or i == n_games):
+                    if Q_lists is not None:
+                        self.Q_rows[:] = Q_lists
+                    self.save_checkpoint(checkpoint_dir)
+
+                self.reset_parameters()
+        finally:
+            if Q_lists is not None:
+                self.Q_rows[:] = Q_lists
+
+        if metrics is not None:
+            metrics.close()
 
     def learning_episode(self, eps, it):
-        state = self.game_map.state
-        action = self.choose_action(state, eps)
+        cell_index = self.game_map.cell_index
+        tlareg_cell = cell_index(self.game_map.tlareg)
+        row = self.state_row(tlareg_cell, cell_index(self.game_map.striga))
+        action = self.choose_action(self.Q_rows[row].tolist(), tlareg_cell, eps)
 
         while True:
             reward = 0
@@ -108,13 +251,13 @@ class Tlareg:
             # Tlareg
             self.tlareg_counter -= 1
             if self.tlareg_counter == 0:  # end of the episode, Tlareg loses
-                self.update(state, action, Tlareg.TLAREG_DEAD_REWARD, it=it)
+                self.update(row, action, Tlareg.TLAREG_DEAD_REWARD, it=it)
                 return
 
             try:
-                reward += self.perform_action(action)
+                reward += self.perform_action(ACTIONS[action])
             except StrigaHitTlareg:  # end of the episode, Tlareg loses
-                self.update(state, action, Tlareg.TLAREG_KILLED_REWARD, it=it)
+                self.update(row, action, Tlareg.TLAREG_KILLED_REWARD, it=it)
                 return
             except TlaregHitStriga:
                 self.hits_before_death_data[it] += 1
@@ -125,7 +268,7 @@ class Tlareg:
                     self.striga_castle_counter = self.config.striga_castle_time
                     reward += Tlareg.STRIGA_HIT_REWARD
                 else:  # end of the episode, Tlareg wins
-                    self.update(state, action, Tlareg.STRIGA_KILLED_REWARD, it=it)
+                    self.update(row, action, Tlareg.STRIGA_KILLED_REWARD, it=it)
                     return
 
             # striga
@@ -137,31 +280,154 @@ class Tlareg:
                 try:
                     self.striga.move()
                 except StrigaHitTlareg:  # end of the episode, Tlareg loses
-                    self.update(state, action, Tlareg.TLAREG_KILLED_REWARD, it=it)
+                    self.update(row, action, Tlareg.TLAREG_KILLED_REWARD, it=it)
                     return
 
             # end of turn, update
-            next_state = self.game_map.state
-            next_action = self.choose_action(next_state, eps)
-            self.update(state, action, reward, next_state, next_action, it=it)
-            state = next_state
+            tlareg_cell = cell_index(self.game_map.tlareg)
+            next_row = self.state_row(tlareg_cell, cell_index(self.game_map.striga))
+            next_action = self.choose_action(self.Q_rows[next_row].tolist(), tlareg_cell, eps)
+            self.update(row, action, reward, next_row, next_action, it=it)
+            row = next_row
             action = next_action
 
             self.tlareg_life_time_data[it] += 1
 
-    def update(self, s, a, r, n_s=None, n_a=None, it=None):
+    def stochastic_learning_episode(self, eps, it, Q_lists):
+        """
+            learning_episode against StrigaStochastic, played on cell indices, the plain lists of map_tables and
+            Q_lists (the rows of Q_rows as lists) instead of Positions, GameMap calls, exceptions and NumPy scalars.
+            The rules, the rewards and the order of the random draws are the same, so a seeded run learns the same Q.
+            Only the final positions are written back to the game map and Striga (the attacked cells drawn by the GUI
+            are not).
+        """
+        game_map, striga, config = self.game_map, self.striga, self.config
+        neighbors, tlareg_hits, striga_hits, castle_exits, distances, cell_x, cell_y = self.map_tables
+        n_cells = game_map.n_cells
+        frequency = game_map.tlareg_frequency
+        alpha, gamma = self.alpha, self.gamma
+        choose_action = self.choose_action
+        rand, choice = random.random, random.choice
+
+        attack = Action.ATTACK.index
+        directions = list(range(len(DIRECTIONS)))
+
+        tlareg_cell = game_map.cell_index(game_map.tlareg)
+        striga_cell = game_map.cell_index(game_map.striga)
+        castle_cell = game_map.cell_index(game_map.castle)
+        momentum = DIRECTION_INDEX[game_map.striga_momentum]
+        prev_direction = DIRECTION_INDEX[striga.prev_direction]
+        attack_probability = striga.attack_probability
+        tlareg_counter, striga_lives = self.tlareg_counter, self.striga_lives
+        castle_counter = self.striga_castle_counter
+        life_time = 0
+        rewards = 0
+
+        values = Q_lists[tlareg_cell * n_cells + striga_cell]
+        action = choose_action(values, tlareg_cell, eps)
+
+        while True:
+            reward = 0
+
+            # Tlareg
+            tlareg_counter -= 1
+            if tlareg_counter == 0:  # end of the episode, Tlareg loses
+                reward = Tlareg.TLAREG_DEAD_REWARD
+                break
+
+            if action == attack:
+                if tlareg_hits[tlareg_cell][striga_cell]:
+                    self.hits_before_death_data[it] += 1
+                    tlareg_counter = config.tlareg_counter_start
+                    striga_lives -= 1
+                    if striga_lives > 0:
+                        striga_cell = castle_cell
+                        castle_counter = config.striga_castle_time
+                        reward += Tlareg.STRIGA_HIT_REWARD
+                    else:  # end of the episode, Tlareg wins
+                        reward = Tlareg.STRIGA_KILLED_REWARD
+                        break
+                else:
+                    reward += Tlareg.TLAREG_MISSED_REWARD
+            else:
+                prev_dist = distances[tlareg_cell][striga_cell]
+                tlareg_cell = neighbors[tlareg_cell][ACTION_DIRECTIONS[action]]
+                frequency[cell_y[tlareg_cell]][cell_x[tlareg_cell]] += 1
+                if tlareg_cell == striga_cell:  # end of the episode, Tlareg loses
+                    reward = Tlareg.TLAREG_KILLED_REWARD
+                    break
+                if distances[tlareg_cell][striga_cell] < prev_dist:
+                    reward += Tlareg.GETTING_CLOSER_REWARD
+                else:
+                    reward += Tlareg.NOT_GETTING_CLOSER_REWARD
+
+            # striga
+            if castle_counter > 0:
+                castle_counter -= 1
+                if castle_counter == 0:
+                    striga_cell = choice([cell for cell in castle_exits if cell != tlareg_cell])
+            elif rand() < attack_probability:
+                if striga_hits[momentum][striga_cell][tlareg_cell]:  # end of the episode, Tlareg loses
+                    tlareg_cell = None
+                    reward = Tlareg.TLAREG_KILLED_REWARD
+                    break
+            else:
+                direction = choice([prev_direction, choice(directions)])
+                new_cell = neighbors[striga_cell][direction]
+                if new_cell < 0:
+                    direction = OPPOSITE_DIRECTIONS[direction]
+                    new_cell = neighbors[striga_cell][direction]
+                if new_cell >= 0 and new_cell != tlareg_cell:
+                    striga_cell = new_cell
+                    momentum = prev_direction = direction
+
+            # end of turn, update as in Tlareg.update
+            next_values = Q_lists[tlareg_cell * n_cells + striga_cell]
+            next_action = choose_action(next_values, tlareg_cell, eps)
+            values[action] += alpha * (reward + gamma * next_values[next_action] - values[action])
+            rewards += reward
+            values = next_values
+            action = next_action
+
+            life_time += 1
+
+        values[action] += alpha * (reward - values[action])
+        self.rewards_data[it] += rewards + reward
+        self.tlareg_life_time_data[it] += life_time
+
+        self.tlareg_counter, self.striga_lives = tlareg_counter, striga_lives
+        self.striga_castle_counter = castle_counter
+        game_map.tlareg = None if tlareg_cell is None else game_map.positions[tlareg_cell]
+        game_map.striga = game_map.positions[striga_cell]
+        game_map.striga_momentum = DIRECTIONS[momentum]
+        striga.prev_direction = DIRECTIONS[prev_direction]
+
+    def update(self, row, a, r, n_row=None, n_a=None, it=None):
+        """
+            Updates Q_rows[row, a] with the reward r, n_row and n_a are the row and the action index of the next state.
+        """
         if it is not None:
             self.rewards_data[it] += r
 
-        if n_s is not None:
-            self.Q[s][a] += self.alpha * (r + self.gamma * self.Q[n_s][n_a] - self.Q[s][a])
+        Q = self.Q_rows
+        if n_row is not None:
+            Q[row, a] += self.alpha * (r + self.gamma * Q[n_row, n_a] - Q[row, a])
         else:
-            self.Q[s][a] += self.alpha * (r - self.Q[s][a])
-
-    def get_best_action(self, state):
-        max_value = max(self.Q[state].values())
-        best_actions = [action for action, value in self.Q[state].items() if value == max_value]
-        return random.choice(best_actions)
+            Q[row, a] += self.alpha * (r - Q[row, a])
+
+    @staticmethod
+    def best_action(values):
+        # a plain list is much faster than NumPy reductions for a handful of actions. Ties are broken randomly
+        # (TlaregQLearning explores only through them), the scan for all the best actions is skipped if there is one
+        max_value = max(values)
+        if values.count(max_value) == 1:
+            return values.index(max_value)
+        return random.choice([action for action, value in enumerate(values) if value == max_value])
+
+    def get_best_action(self, state: State):
+        cell_index = self.game_map.cell_index
+        row = self.state_row(cell_index(state.tlareg), cell_index(state.striga))
+        return ACTIONS[self.best_action(self.Q_rows[row].tolist())]
 
     def perform_action(self, action):
         if action == Action.ATTACK:
@@ -184,40 +450,17 @@ class Tlareg:
         else:
             self.game_map.move_tlareg(action.to_direction())
 
-    def plot_single(self, data, title, ylabel):
-        weighted_sums = np.empty(len(self.x_data), dtype=float)
-        weighted_sums[0] = data[0]
-        alpha = 0.005
-        for i in range(1, len(data)):
-            weighted_sums[i] = alpha * data[i] + (1 - alpha) * weighted_sums[i - 1]
-        plt.plot(self.x_data, weighted_sums, label=f'exponential, alpha = {alpha}')
-
-        plt.plot(self.x_data, np.cumsum(data) / np.arange(1, len(self.x_data) + 1), label='cumulative')
-        plt.title(f'{title}')
-        plt.xlabel('iterations')
-        plt.ylabel(f'{ylabel}')
-        plt.gca().yaxis.grid(True)
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(f'plots/{title.replace(" ", "_").lower()}.jpg')
-        plt.close()
-
-    def plot_data(self):
-        self.plot_single(self.rewards_data, 'Rewards', 'sum of the rewards')
-        self.plot_single(self.tlareg_life_time_data, 'Life time', 'survived turns')
-        self.plot_single(self.hits_before_death_data, 'Hits before death', 'hits')
-
 
 class TlaregSarsa(Tlareg):
 
-    def choose_action(self, state, eps):
-        if random.uniform(0, 1) < eps:
-            return random.choice(list(self.Q[state].items()))[0]
+    def choose_action(self, values, tlareg_cell, eps):
+        if random.random() < eps:
+            return random.choice(self.possible_actions[tlareg_cell])
         else:
-            return self.get_best_action(state)
+            return self.best_action(values)
 
 
 class TlaregQLearning(Tlareg):
 
-    def choose_action(self, state, eps):
-        return self.get_best_action(state)
+    def choose_action(self, values, tlareg_cell, eps):
+        return self.best_action(values)
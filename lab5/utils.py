@@ -61,32 +61,62 @@ class Action(Enum):
         else:
             raise ValueError('Wrong argument')
 
+    @property
+    def index(self):
+        """
+            Position of the action along the last axis of the Q table.
+        """
+        return self.value - 1
+
     def __repr__(self):
         return self.name
 
 
 class Position:
-
-    def __init__(self, x: int, y: int):
-        self.x = x
-        self.y = y
-
-    def move(self, direction: Direction):
-        self.x += direction.x
-        self.y += direction.y
+    """
+        Immutable, interned grid position - there is only one Position object for a given (x, y), so equality is
+        identity and the hash is a precomputed, collision-free packing of the coordinates.
+    """
+    __slots__ = ('x', 'y', '_hash', '_shifted')
+
+    _OFFSET = 1 << 14  # coordinates must lie in [-_OFFSET, _OFFSET)
+    _instances = {}
+
+    def __new__(cls, x: int, y: int):
+        position = cls._instances.get((x, y))
+        if position is None:
+            if not (-cls._OFFSET <= x < cls._OFFSET and -cls._OFFSET <= y < cls._OFFSET):
+                raise ValueError(f'Coordinates out of range: ({x}, {y})')
+            position = object.__new__(cls)
+            object.__setattr__(position, 'x', x)
+            object.__setattr__(position, 'y', y)
+            object.__setattr__(position, '_hash', ((x + cls._OFFSET) << 15) | (y + cls._OFFSET))
+            object.__setattr__(position, '_shifted', {})
+            cls._instances[(x, y)] = position
+        return position
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Position is immutable')
+
+    def __reduce__(self):
+        return Position, (self.x, self.y)
 
     def is_in_map(self, game_map):
         return 0 <= self.x < game_map.width and 0 <= self.y < game_map.height
 
     def is_valid(self, game_map):
-        return self.is_in_map(game_map) and self not in game_map.walls
+        return self.is_in_map(game_map) and bool(game_map.valid_cells[game_map.cell_index(self)])
 
     def get_dist(self):
         return abs(self.x) + abs(self.y)
 
     def __add__(self, other):
         if isinstance(other, Direction):
-            return Position(self.x + other.value[0], self.y + other.value[1])
+            position = self._shifted.get(other)
+            if position is None:
+                position = Position(self.x + other.value[0], self.y + other.value[1])
+                self._shifted[other] = position
+            return position
         else:
             return Position(self.x + other.x, self.y + other.y)
 
@@ -97,26 +127,45 @@ class Position:
             return Position(self.x - other.x, self.y - other.y)
 
     def __eq__(self, other):
-        return self.x == other.x and self.y == other.y
+        return self is other
 
     def __hash__(self):
-        return (self.x, self.y).__hash__()
+        return self._hash
 
     def __repr__(self):
         return f'({self.x}, {self.y})'
 
 
 class State:
-
-    def __init__(self, tlareg: Position, striga: Position):
-        self.tlareg = tlareg
-        self.striga = striga
+    """
+        Immutable, interned pair of positions with a collision-free hash built from the hashes of both positions.
+    """
+    __slots__ = ('tlareg', 'striga', '_hash')
+
+    _instances = {}
+
+    def __new__(cls, tlareg: Position, striga: Position):
+        key = (tlareg._hash << 30) | striga._hash
+        state = cls._instances.get(key)
+        if state is None:
+            state = object.__new__(cls)
+            object.__setattr__(state, 'tlareg', tlareg)
+            object.__setattr__(state, 'striga', striga)
+            object.__setattr__(state, '_hash', key)
+            cls._instances[key] = state
+        return state
+
+    def __setattr__(self, name, value):
+        raise AttributeError('State is immutable')
+
+    def __reduce__(self):
+        return State, (self.tlareg, self.striga)
 
     def __eq__(self, other):
-        return self.tlareg == other.tlareg and self.striga == other.striga
+        return self is other
 
     def __hash__(self):
-        return (self.tlareg + self.striga).__hash__()
+        return self._hash
 
     def __repr__(self):
         return f'T: ({self.tlareg.x}, {self.tlareg.y}), S: ({self.striga.x}, {self.striga.y})'